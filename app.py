@@ -1,19 +1,47 @@
 import os
 import logging
+import orjson
 from flask import Flask
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from flask_compress import Compress
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes responses and parses request bodies with orjson"""
+
+    # Naive datetimes keep their local wall-clock time (no OPT_NAIVE_UTC)
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, obj, **kwargs):
+        option = self.OPTIONS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 # Create Flask app
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+# Serve /api/foo and /api/foo/ alike instead of redirecting on a trailing slash
+app.url_map.strict_slashes = False
 CORS(app)
 
 # Configure app
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
 app.config['DEBUG'] = True
 
+# Compress JSON and HTML responses; SSE streams are left alone so chunks flush immediately
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_LEVEL'] = 4
+app.config['COMPRESS_MIN_SIZE'] = 500
+app.config['COMPRESS_STREAMS'] = False
+Compress(app)
+
 # Import routes after app creation to avoid circular imports
 from run_assistant import *
 
@@ -28,9 +28,36 @@ class Config:
         'https://www.googleapis.com/auth/tasks'
     ]
     
+    # OAuth client secrets downloaded from the Google Cloud console
+    GOOGLE_CLIENT_SECRETS_FILE = 'credentials/credentials.json'
+    
+    # Seconds a signed OAuth state parameter stays valid
+    OAUTH_STATE_MAX_AGE = 600
+    
+    # Seconds a request waits for a just-completed Google login to finish setting up
+    AUTH_FINALIZE_TIMEOUT = 5
+    
+    # Saved Google OAuth token (authorized-user JSON)
+    GOOGLE_TOKEN_FILE = 'credentials/token.json'
+    
+    # Conversation history shared by all worker processes
+    CONTEXT_MEMORY_FILE = 'data/context.json'
+    
     # Timezone configuration
     DEFAULT_TIMEZONE = 'Europe/London'
     
+    # Seconds a rendered dashboard payload is reused before re-querying Google
+    DASHBOARD_CACHE_TTL = 20
+    
+    # Seconds the dashboard waits for its Google fetches before serving what it has
+    DASHBOARD_FETCH_TIMEOUT = 10
+    
+    # Seconds an AI priority analysis is reused for the same set of unread emails
+    EMAIL_ANALYSIS_CACHE_TTL = 300
+    
+    # Replies to identical AI prompts kept in memory (least recently used are evicted)
+    LLM_RESPONSE_CACHE_SIZE = 512
+    
     @staticmethod
     def validate_config():
         """Validate that required configuration is present"""
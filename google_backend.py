@@ -3,10 +3,14 @@ import anthropic
 import json
 import re
 import os
-import pickle
 import base64
+import fcntl
 import logging
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Any
 import pandas as pd
 from pathlib import Path
@@ -17,11 +21,14 @@ from email.mime.multipart import MIMEMultipart
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest, build_http
+from google_auth_httplib2 import AuthorizedHttp
 
 # Timezone handling
-import pytz
+from zoneinfo import ZoneInfo
 from dateutil import parser as dateutil_parser
 
 # Local imports
@@ -31,13 +38,49 @@ from config import Config
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Worker pool for the calendar look-ups behind a single agent request
+_calendar_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='calendar-agent')
+
+def _thread_request_builder(creds):
+    """Build API requests on a per-thread authorized connection
+
+    httplib2 connections are not thread-safe, so a service that is used from
+    several worker threads gives each thread its own Http object. build_http
+    keeps the client library's socket timeout and redirect handling.
+    """
+    local = threading.local()
+
+    def build_request(http, *args, **kwargs):
+        if not hasattr(local, 'http'):
+            local.http = AuthorizedHttp(creds, http=build_http())
+        return HttpRequest(local.http, *args, **kwargs)
+
+    return build_request
+
+@lru_cache(maxsize=None)
+def _discovery_document(service_name, version):
+    """Bundled discovery document for an API, read from disk once per process"""
+    return get_static_doc(service_name, version)
+
+def _build_service(service_name, version, creds):
+    """Build an API client from the cached discovery document
+
+    Requests run on per-thread authorized connections (see _thread_request_builder),
+    which each thread keeps open and reuses across calls.
+    """
+    request_builder = _thread_request_builder(creds)
+    document = _discovery_document(service_name, version)
+    if document is None:
+        return build(service_name, version, credentials=creds, requestBuilder=request_builder)
+    return build_from_document(document, credentials=creds, requestBuilder=request_builder)
+
 class GoogleAuthManager:
     """Manages Google OAuth authentication"""
     
     def __init__(self, credentials_dir='credentials'):
         self.credentials_dir = Path(credentials_dir)
         self.credentials_file = self.credentials_dir / 'credentials.json'
-        self.token_file = self.credentials_dir / 'token.pickle'
+        self.token_file = self.credentials_dir / 'token.json'
         self.creds = None
         
         # Create credentials directory if it doesn't exist
@@ -45,9 +88,9 @@ class GoogleAuthManager:
         
         # Set up timezone
         try:
-            self.local_timezone = pytz.timezone(Config.DEFAULT_TIMEZONE)
+            self.local_timezone = ZoneInfo(Config.DEFAULT_TIMEZONE)
         except:
-            self.local_timezone = pytz.UTC
+            self.local_timezone = ZoneInfo("UTC")
             logger.warning(f"Could not load timezone {Config.DEFAULT_TIMEZONE}, using UTC")
 
     def authenticate(self):
@@ -55,8 +98,9 @@ class GoogleAuthManager:
         try:
             # Load existing token
             if self.token_file.exists():
-                with open(self.token_file, 'rb') as token:
-                    self.creds = pickle.load(token)
+                self.creds = Credentials.from_authorized_user_file(
+                    str(self.token_file), Config.GOOGLE_SCOPES
+                )
 
             # If there are no (valid) credentials available, let the user log in
             if not self.creds or not self.creds.valid:
@@ -77,8 +121,7 @@ class GoogleAuthManager:
                     self.creds = flow.run_local_server(port=0)
 
                 # Save the credentials for the next run
-                with open(self.token_file, 'wb') as token:
-                    pickle.dump(self.creds, token)
+                self.token_file.write_text(self.creds.to_json())
                     
             logger.info("Google authentication successful")
             return self.creds
@@ -91,14 +134,14 @@ class GoogleCalendarService:
     """Google Calendar integration service"""
 
     def __init__(self, creds):
-        self.service = build('calendar', 'v3', credentials=creds)
+        self.service = _build_service('calendar', 'v3', creds)
         self.calendar_id = 'primary'
         
         # Set up timezone handling
         try:
-            self.local_timezone = pytz.timezone(Config.DEFAULT_TIMEZONE)
+            self.local_timezone = ZoneInfo(Config.DEFAULT_TIMEZONE)
         except:
-            self.local_timezone = pytz.UTC
+            self.local_timezone = ZoneInfo("UTC")
             logger.warning("Using UTC timezone as fallback")
 
     def _parse_datetime(self, date_str, all_day=False):
@@ -109,10 +152,7 @@ class GoogleCalendarService:
                 date_obj = datetime.strptime(date_str, '%Y-%m-%d')
                 # Set to start of day in local timezone
                 date_obj = date_obj.replace(hour=0, minute=0, second=0, microsecond=0)
-                if hasattr(self.local_timezone, 'localize'):
-                    date_obj = self.local_timezone.localize(date_obj)
-                else:
-                    date_obj = date_obj.replace(tzinfo=self.local_timezone)
+                date_obj = date_obj.replace(tzinfo=self.local_timezone)
                 return date_obj
             else:
                 # For timed events
@@ -128,10 +168,7 @@ class GoogleCalendarService:
                     date_obj = date_obj.astimezone(self.local_timezone)
                 else:
                     # If no timezone, assume local
-                    if hasattr(self.local_timezone, 'localize'):
-                        date_obj = self.local_timezone.localize(date_obj)
-                    else:
-                        date_obj = date_obj.replace(tzinfo=self.local_timezone)
+                    date_obj = date_obj.replace(tzinfo=self.local_timezone)
                     
                 return date_obj
                 
@@ -145,13 +182,13 @@ class GoogleCalendarService:
         if time_min is None:
             # Use local timezone (BST) instead of UTC
             now_local = datetime.now(self.local_timezone)
-            time_min = now_local.astimezone(pytz.UTC).isoformat()
+            time_min = now_local.astimezone(timezone.utc).isoformat()
         elif hasattr(time_min, 'isoformat'):
             # Convert datetime object to ISO format string
             if time_min.tzinfo is None:
                 # Assume local timezone if no timezone specified
-                time_min = self.local_timezone.localize(time_min)
-            time_min = time_min.astimezone(pytz.UTC).isoformat()
+                time_min = time_min.replace(tzinfo=self.local_timezone)
+            time_min = time_min.astimezone(timezone.utc).isoformat()
 
         try:
             logger.info(f"Fetching {max_results} upcoming events from Google Calendar")
@@ -271,9 +308,8 @@ class GoogleCalendarService:
             end_of_day = datetime.combine(target_date, datetime.max.time())
             
             # Convert to UTC for API call
-            if hasattr(self, 'local_timezone'):
-                start_of_day = self.local_timezone.localize(start_of_day).astimezone(pytz.UTC)
-                end_of_day = self.local_timezone.localize(end_of_day).astimezone(pytz.UTC)
+            start_of_day = start_of_day.replace(tzinfo=self.local_timezone).astimezone(timezone.utc)
+            end_of_day = end_of_day.replace(tzinfo=self.local_timezone).astimezone(timezone.utc)
             
             logger.info(f"Fetching events for {target_date} from Google Calendar")
             events_result = self.service.events().list(
@@ -379,8 +415,8 @@ class GoogleCalendarService:
                 else:
                     # For future days, start at 9 AM
                     future_date = now.date() + timedelta(days=day)
-                    current_time = self.local_timezone.localize(
-                        datetime.combine(future_date, datetime.min.time().replace(hour=9))
+                    current_time = datetime.combine(
+                        future_date, datetime.min.time().replace(hour=9), tzinfo=self.local_timezone
                     )
                     day_end = current_time.replace(hour=17)  # End at 5 PM
 
@@ -440,7 +476,7 @@ class GoogleTasksService:
     def __init__(self, creds):
         """Initialize with authenticated credentials"""
         self.creds = creds
-        self.service = build('tasks', 'v1', credentials=creds)
+        self.service = _build_service('tasks', 'v1', creds)
         logger.info("✅ Google Tasks service initialized")
         
         # Test the service by trying to get task lists
@@ -485,7 +521,7 @@ class GoogleTasksService:
                     # Parse due date if available
                     due_date = None
                     if task_item.get('due'):
-                        due_date = dateutil_parser.parse(task_item['due']).replace(tzinfo=pytz.UTC)
+                        due_date = dateutil_parser.parse(task_item['due']).replace(tzinfo=timezone.utc)
                     
                     # Create Task object with Google Task ID
                     task = Task(
@@ -494,7 +530,7 @@ class GoogleTasksService:
                         due_date=due_date,
                         completed=task_item.get('status') == 'completed',
                         priority='Medium',  # Google Tasks doesn't have priority, default to Medium
-                        created_at=dateutil_parser.parse(task_item['updated']).replace(tzinfo=pytz.UTC) if task_item.get('updated') else datetime.now(pytz.UTC)
+                        created_at=dateutil_parser.parse(task_item['updated']).replace(tzinfo=timezone.utc) if task_item.get('updated') else datetime.now(timezone.utc)
                     )
                     # Add Google Task ID as an attribute for deletion
                     task.google_task_id = task_item.get('id')
@@ -515,7 +551,7 @@ class GoogleTasksService:
     def get_todays_tasks(self):
         """Get tasks due today or overdue"""
         all_tasks = self.get_tasks(show_completed=False)
-        today = datetime.now(pytz.UTC).date()
+        today = datetime.now(timezone.utc).date()
         
         todays_tasks = []
         for task in all_tasks:
@@ -615,17 +651,25 @@ class GoogleTasksService:
 class GmailService:
     """Gmail integration service"""
 
+    # Headers requested when only message metadata is needed
+    METADATA_HEADERS = ['Subject', 'From', 'Date', 'X-Priority']
+
     def __init__(self, creds):
-        self.service = build('gmail', 'v1', credentials=creds)
+        self.service = _build_service('gmail', 'v1', creds)
         
         # Set up timezone
         try:
-            self.local_timezone = pytz.timezone(Config.DEFAULT_TIMEZONE)
+            self.local_timezone = ZoneInfo(Config.DEFAULT_TIMEZONE)
         except:
-            self.local_timezone = pytz.UTC
+            self.local_timezone = ZoneInfo("UTC")
 
-    def get_messages(self, query='is:unread', max_results=10):
-        """Get email messages based on query"""
+    def get_messages(self, query='is:unread', max_results=10, batch=True, metadata_only=False):
+        """Get email messages based on query
+        
+        With batch=True the message details are fetched in a single batched
+        HTTP request instead of one GET per message. With metadata_only=True
+        only the headers are fetched and the content is Gmail's snippet.
+        """
         try:
             logger.info(f"Fetching emails with query: {query}")
             results = self.service.users().messages().list(
@@ -634,49 +678,32 @@ class GmailService:
             
             messages = results.get('messages', [])
             logger.info(f"Found {len(messages)} messages")
+            
+            message_ids = [message['id'] for message in messages]
+            if batch:
+                raw_messages = self._batch_get_messages(message_ids, metadata_only)
+            else:
+                raw_messages = {}
+                for message_id in message_ids:
+                    try:
+                        raw_messages[message_id] = self._get_message_request(
+                            message_id, metadata_only
+                        ).execute()
+                    except Exception as e:
+                        logger.error(f"Error fetching email {message_id}: {e}")
 
             emails = []
-            for message in messages:
+            for message_id in message_ids:
+                msg = raw_messages.get(message_id)
+                if msg is None:
+                    continue
                 try:
-                    # Get full message details
-                    msg = self.service.users().messages().get(
-                        userId='me', id=message['id']
-                    ).execute()
-
-                    # Extract headers
-                    headers = {h['name']: h['value'] for h in msg['payload']['headers']}
-                    
-                    # Parse timestamp
-                    timestamp = datetime.fromtimestamp(
-                        int(msg['internalDate']) / 1000,
-                        tz=self.local_timezone
-                    )
-
-                    # Extract message content
-                    content = self._extract_message_content(msg['payload'])
-
-                    # Determine priority (simplified)
-                    priority = 'High' if headers.get('X-Priority', '3') in ['1', '2'] else 'Normal'
-
-                    # Check if read
-                    is_read = 'UNREAD' not in msg.get('labelIds', [])
-
-                    email = Email(
-                        sender=headers.get('From', 'Unknown'),
-                        subject=headers.get('Subject', 'No Subject'),
-                        content=content,
-                        timestamp=timestamp,
-                        priority=priority,
-                        read=is_read,
-                        gmail_id=message['id'],
-                        thread_id=msg.get('threadId')
-                    )
-
+                    email = self._parse_message(message_id, msg, metadata_only)
                     emails.append(email)
                     logger.debug(f"Parsed email: {email.subject} from {email.sender}")
 
                 except Exception as e:
-                    logger.error(f"Error parsing email {message['id']}: {e}")
+                    logger.error(f"Error parsing email {message_id}: {e}")
                     continue
 
             logger.info(f"Successfully parsed {len(emails)} emails")
@@ -686,6 +713,71 @@ class GmailService:
             logger.error(f'Gmail API error: {error}')
             return []
 
+    def _get_message_request(self, message_id, metadata_only=False):
+        """Build the messages.get request for one message"""
+        if metadata_only:
+            return self.service.users().messages().get(
+                userId='me', id=message_id, format='metadata',
+                metadataHeaders=self.METADATA_HEADERS
+            )
+        return self.service.users().messages().get(userId='me', id=message_id)
+
+    def _batch_get_messages(self, message_ids, metadata_only=False):
+        """Fetch message resources for several ids in batched requests"""
+        raw_messages = {}
+
+        def collect(request_id, response, exception):
+            if exception is not None:
+                logger.error(f"Error fetching email {request_id}: {exception}")
+            else:
+                raw_messages[request_id] = response
+
+        # Gmail recommends keeping batches to 50 calls or fewer
+        for start in range(0, len(message_ids), 50):
+            batch = self.service.new_batch_http_request(callback=collect)
+            for message_id in message_ids[start:start + 50]:
+                batch.add(
+                    self._get_message_request(message_id, metadata_only),
+                    request_id=message_id
+                )
+            batch.execute()
+
+        return raw_messages
+
+    def _parse_message(self, message_id, msg, metadata_only=False):
+        """Build an Email from a Gmail message resource"""
+        # Extract headers
+        headers = {h['name']: h['value'] for h in msg['payload']['headers']}
+        
+        # Parse timestamp
+        timestamp = datetime.fromtimestamp(
+            int(msg['internalDate']) / 1000,
+            tz=self.local_timezone
+        )
+
+        # Extract message content (metadata responses carry no body)
+        if metadata_only:
+            content = msg.get('snippet', '')[:500]
+        else:
+            content = self._extract_message_content(msg['payload'])
+
+        # Determine priority (simplified)
+        priority = 'High' if headers.get('X-Priority', '3') in ['1', '2'] else 'Normal'
+
+        # Check if read
+        is_read = 'UNREAD' not in msg.get('labelIds', [])
+
+        return Email(
+            sender=headers.get('From', 'Unknown'),
+            subject=headers.get('Subject', 'No Subject'),
+            content=content,
+            timestamp=timestamp,
+            priority=priority,
+            read=is_read,
+            gmail_id=message_id,
+            thread_id=msg.get('threadId')
+        )
+
     def _extract_message_content(self, payload):
         """Extract text content from email payload"""
         content = ""
@@ -738,46 +830,155 @@ class GmailService:
             logger.error(f'Error deleting email: {error}')
             raise error
 
+class TokenStore:
+    """Saved Google OAuth token, shared by every worker process through one JSON file"""
+    
+    def __init__(self, token_file):
+        self.token_file = Path(token_file)
+        self.token_file.parent.mkdir(exist_ok=True)
+    
+    def version(self):
+        """Identify the saved token, or None when there is none
+
+        Every atomic replace gives the file a new inode, so a disconnect and
+        re-login within one mtime tick still reads as a change.
+        """
+        try:
+            stat = self.token_file.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    
+    def get(self):
+        """Return the saved authorized-user JSON, or None"""
+        try:
+            return self.token_file.read_text()
+        except FileNotFoundError:
+            return None
+    
+    def put(self, creds_json):
+        """Save authorized-user JSON atomically and return its new version"""
+        tmp_file = self.token_file.with_name(f"{self.token_file.name}.{os.getpid()}.tmp")
+        tmp_file.write_text(creds_json)
+        os.replace(tmp_file, self.token_file)
+        return self.version()
+    
+    def delete(self):
+        """Remove the saved token"""
+        try:
+            self.token_file.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
 class ContextMemory:
-    """Simple in-memory context storage for conversation history"""
+    """Conversation history storage, optionally persisted so every worker process shares it"""
     
-    def __init__(self):
+    def __init__(self, storage_file=None):
         self.context = []
         self.max_context = 10
+        # Guards self.context when requests are served from several threads
+        self._lock = threading.Lock()
+        
+        # With a storage file, history lives on disk and survives restarts; each
+        # worker re-reads it only when another process has changed it
+        self.storage_file = Path(storage_file) if storage_file else None
+        self._loaded_version = None
+        if self.storage_file:
+            self.storage_file.parent.mkdir(exist_ok=True)
+            # Sidecar file locked around each read-modify-write, so concurrent workers can't drop messages
+            self._lock_file = self.storage_file.with_name(f"{self.storage_file.name}.lock")
+            self._refresh()
+    
+    @contextmanager
+    def _exclusive(self):
+        """Hold the thread lock and, with a storage file, an exclusive cross-process lock"""
+        with self._lock:
+            if not self.storage_file:
+                yield
+                return
+            with open(self._lock_file, 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+    
+    def _file_version(self):
+        """Identify the current storage file; every atomic replace gives it a new inode"""
+        stat = self.storage_file.stat()
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    
+    def _refresh(self):
+        """Reload history written by another process since we last read it"""
+        if not self.storage_file:
+            return
+        try:
+            version = self._file_version()
+            if version == self._loaded_version:
+                return
+            with open(self.storage_file, 'r') as f:
+                self.context = json.load(f)[-self.max_context:]
+            self._loaded_version = version
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Could not load conversation context: {e}")
+    
+    def _persist(self):
+        """Write history to the storage file atomically"""
+        if not self.storage_file:
+            return
+        try:
+            tmp_file = self.storage_file.with_name(f"{self.storage_file.name}.{os.getpid()}.tmp")
+            with open(tmp_file, 'w') as f:
+                json.dump(self.context, f)
+            os.replace(tmp_file, self.storage_file)
+            self._loaded_version = self._file_version()
+        except Exception as e:
+            logger.warning(f"Could not save conversation context: {e}")
     
     def add_message(self, role, content):
         """Add a message to context"""
-        self.context.append({"role": role, "content": content})
-        
-        # Keep only recent messages
-        if len(self.context) > self.max_context:
-            self.context = self.context[-self.max_context:]
+        with self._exclusive():
+            self._refresh()
+            self.context.append({"role": role, "content": content})
+            
+            # Keep only recent messages
+            if len(self.context) > self.max_context:
+                self.context = self.context[-self.max_context:]
+            self._persist()
     
     def get_context(self):
         """Get current context"""
-        return self.context.copy()
+        with self._lock:
+            self._refresh()
+            return self.context.copy()
     
     def clear(self):
         """Clear context"""
-        self.context.clear()
+        with self._exclusive():
+            self.context.clear()
+            self._persist()
 
 class CalendarAgent:
     """AI agent for calendar operations"""
     
-    def __init__(self, anthropic_client, calendar_service):
+    def __init__(self, anthropic_client, calendar_service, on_auth_error=None):
         self.client = anthropic_client
         self.calendar = calendar_service
+        # Called with the AuthenticationError when the API rejects the key
+        self.on_auth_error = on_auth_error
     
     def handle_request(self, message, context=None):
         """Handle calendar-related requests"""
         try:
             from datetime import datetime, timedelta
-            import pytz
             import re
             import json
             
             # Get current date and time in user's timezone
-            user_tz = pytz.timezone('Europe/London')  # BST/UTC+1
+            user_tz = ZoneInfo('Europe/London')  # BST/UTC+1
             now = datetime.now(user_tz)
             today_str = now.strftime("%A, %B %d, %Y")
             current_time_str = now.strftime("%I:%M %p %Z")
@@ -796,6 +997,15 @@ class CalendarAgent:
             # Handle other calendar requests (viewing, finding free time, etc.)
             return self._handle_general_calendar_request(message, user_tz, now)
             
+        except anthropic.AuthenticationError as e:
+            if self.on_auth_error:
+                self.on_auth_error(e)
+            else:
+                logger.error(f"Anthropic API key rejected: {e}")
+            return {
+                'response': "AI service is not available. Please check your Anthropic API key configuration.",
+                'events': []
+            }
         except Exception as e:
             logger.error(f"Calendar agent error: {e}")
             return {
@@ -885,6 +1095,9 @@ Rules:
                     'action': 'needs_clarification'
                 }
                 
+        except anthropic.AuthenticationError:
+            # handle_request reports a rejected key for every calendar path
+            raise
         except Exception as e:
             logger.error(f"Error in meeting scheduling: {e}")
             return {
@@ -905,7 +1118,7 @@ Rules:
             meeting_datetime = datetime.combine(meeting_date, meeting_time)
             
             # Localize to user timezone
-            meeting_datetime = user_tz.localize(meeting_datetime)
+            meeting_datetime = meeting_datetime.replace(tzinfo=user_tz)
             
             # Create Meeting object
             from models import Meeting
@@ -993,9 +1206,17 @@ Rules:
                 days_until_monday = 7
             next_monday = now + timedelta(days=days_until_monday)
             specific_date = next_monday.date()
-            
+        
+        # The calendar look-ups are independent, so run them concurrently
+        upcoming_future = _calendar_executor.submit(self.calendar.get_upcoming_events, max_results=50, time_min=now)
+        free_slots_future = _calendar_executor.submit(self.calendar.find_free_time, duration_minutes=60, days_ahead=7)
+        monday_future = None
+        if specific_date:
+            monday_future = _calendar_executor.submit(self.calendar.get_events_for_date, specific_date)
+        
+        if monday_future:
             # Get events for that specific date
-            monday_events = self.calendar.get_events_for_date(specific_date)
+            monday_events = monday_future.result()
             if monday_events:
                 date_events_summary = f"\nEvents on Monday, {specific_date.strftime('%B %d, %Y')}:\n"
                 for event in monday_events:
@@ -1009,7 +1230,7 @@ Rules:
                 date_events_summary = f"\nMonday, {specific_date.strftime('%B %d, %Y')} appears to be completely free - no events scheduled."
         
         # Get comprehensive calendar information for the next week
-        upcoming_events = self.calendar.get_upcoming_events(max_results=50, time_min=now)
+        upcoming_events = upcoming_future.result()
         
         # Build detailed events summary with duration
         events_summary = ""
@@ -1027,7 +1248,7 @@ Rules:
             events_summary = "No upcoming events scheduled."
             
         # Get free time analysis for next 7 days
-        free_slots = self.calendar.find_free_time(duration_minutes=60, days_ahead=7)
+        free_slots = free_slots_future.result()
         free_time_summary = ""
         if free_slots:
             # Filter out any slots that are in the past (additional safety check)
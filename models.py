@@ -1,30 +1,46 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional
+from typing import ClassVar, List, Optional
 
-@dataclass
+# Sort ranks for Task.priority; unknown priorities rank as medium
+PRIORITY_HIGH, PRIORITY_MEDIUM, PRIORITY_LOW = 0, 1, 2
+PRIORITY_RANKS = {'high': PRIORITY_HIGH, 'medium': PRIORITY_MEDIUM, 'low': PRIORITY_LOW}
+
+@dataclass(slots=True)
 class Task:
     """Task data structure"""
+    # Bump after changing any task to invalidate every cached to_dict() result
+    dict_version: ClassVar[int] = 0
+
     title: str
     priority: str
     due_date: Optional[datetime]
     description: str
     completed: bool = False
     created_at: Optional[datetime] = None
+    google_task_id: Optional[str] = None
+    priority_rank: int = field(default=PRIORITY_MEDIUM, init=False, repr=False, compare=False)
+    _cached_dict: Optional[dict] = field(default=None, init=False, repr=False, compare=False)
+    _cached_version: int = field(default=-1, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         if self.created_at is None:
             self.created_at = datetime.now()
+        self.priority_rank = PRIORITY_RANKS.get(self.priority, PRIORITY_MEDIUM)
 
     def to_dict(self):
-        return {
-            'title': self.title,
-            'priority': self.priority,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'description': self.description,
-            'completed': self.completed,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        # The returned dict is shared between callers and must not be modified
+        if self._cached_version != Task.dict_version:
+            self._cached_dict = {
+                'title': self.title,
+                'priority': self.priority,
+                'due_date': self.due_date.isoformat() if self.due_date else None,
+                'description': self.description,
+                'completed': self.completed,
+                'created_at': self.created_at.isoformat() if self.created_at else None
+            }
+            self._cached_version = Task.dict_version
+        return self._cached_dict
 
 @dataclass
 class Meeting:
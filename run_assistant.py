@@ -1,20 +1,32 @@
 # run_assistant.py - Main Flask application for Executive Assistant
 import os
+import re
+import hashlib
 import json
 import logging
-from flask import Flask, render_template, request, jsonify, send_from_directory, session, redirect, url_for
+import secrets
+import traceback
+import orjson
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory, redirect, url_for
 from flask_cors import CORS
+from itsdangerous import BadSignature, URLSafeTimedSerializer
 import threading
+import time
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
 from datetime import datetime, timedelta
-import pytz
+from zoneinfo import ZoneInfo
 
 # Local imports
 from google_backend import (
     GoogleAuthManager, GoogleCalendarService, GmailService, GoogleTasksService,
-    CalendarAgent, ContextMemory
+    CalendarAgent, ContextMemory, TokenStore
 )
+from task_manager import TaskManager, EmailInsightAgent, get_anthropic_client
 import anthropic
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import Flow
 from config import Config
 from models import Task, Meeting, Email
 
@@ -31,6 +43,175 @@ except ImportError:
     CORS(app)
     app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
 
+# Shared worker pool for fanning out independent Google API calls.
+# Kept at module level so threads are reused across requests.
+_google_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='google-api')
+
+# Signs the OAuth state parameter, so the callback can verify it without a server-side session
+_oauth_state_serializer = URLSafeTimedSerializer(app.secret_key, salt='google-oauth-state')
+
+# OAuth redirect target; the request's Host header wins over the default domain
+_DEFAULT_DOMAIN = os.environ.get('REPLIT_DEV_DOMAIN', 'localhost:5000')
+_REDIRECT_PATH = '/google_callback'
+
+# OAuth scopes as an immutable tuple, resolved once at import
+_GOOGLE_SCOPES = tuple(Config.GOOGLE_SCOPES)
+
+@lru_cache(maxsize=1)
+def _google_client_config():
+    """Parse the OAuth client secrets file once per process"""
+    with open(Config.GOOGLE_CLIENT_SECRETS_FILE, 'r') as f:
+        return json.load(f)
+
+# Values memoized by _ttl_cache: function name -> (value, expires_at)
+_ttl_values = {}
+_ttl_lock = threading.Lock()
+
+def _ttl_cache(ttl=30):
+    """Memoize a zero-argument function for ttl seconds
+
+    The wrapped function gets an invalidate() method that drops the stored value.
+    """
+    def decorator(fn):
+        key = fn.__name__
+
+        @wraps(fn)
+        def wrapper():
+            with _ttl_lock:
+                entry = _ttl_values.get(key)
+            if entry and time.monotonic() < entry[1]:
+                return entry[0]
+            value = fn()
+            with _ttl_lock:
+                _ttl_values[key] = (value, time.monotonic() + ttl)
+            return value
+
+        def invalidate():
+            with _ttl_lock:
+                _ttl_values.pop(key, None)
+
+        wrapper.invalidate = invalidate
+        return wrapper
+    return decorator
+
+# Time-of-day suggestions for /api/smart-suggestions
+_MORNING_SUGGESTIONS = (
+    "Check my unread emails from yesterday",
+    "What meetings do I have today?",
+    "Review my priority tasks for this morning"
+)
+_MIDDAY_SUGGESTIONS = (
+    "Schedule lunch meeting next week",
+    "Review afternoon calendar",
+    "Send follow-up emails from morning meetings"
+)
+_AFTERNOON_SUGGESTIONS = (
+    "Plan tomorrow's priorities",
+    "Check for urgent emails",
+    "Schedule end-of-week review"
+)
+_EVENING_SUGGESTIONS = (
+    "Review today's accomplishments",
+    "Prepare agenda for tomorrow",
+    "Schedule follow-up tasks"
+)
+
+def _suggestions_for_hour(hour):
+    """Pick the suggestion bucket for an hour of the day"""
+    if 8 <= hour <= 10:
+        return _MORNING_SUGGESTIONS
+    if 11 <= hour <= 13:
+        return _MIDDAY_SUGGESTIONS
+    if 14 <= hour <= 17:
+        return _AFTERNOON_SUGGESTIONS
+    return _EVENING_SUGGESTIONS
+
+# Indexed by hour so requests do a single lookup
+_HOUR_SUGGESTIONS = tuple(_suggestions_for_hour(hour) for hour in range(24))
+
+# Keyword lists used to tell personal tasks apart from meetings in calendar events
+# Task keywords that strongly suggest personal tasks
+TASK_KEYWORDS = [
+    'deadline', 'due', 'submit', 'reminder', 'task', 'todo', 'to do',
+    'finish', 'complete', 'draft', 'personal appointment', 'prep', 'prepare',
+    'bedtime', 'morning', 'workout', 'exercise', 'study', 'practice',
+    'clean', 'organize', 'shopping', 'errands', 'pick up', 'drop off',
+    'appointment', 'dentist', 'doctor', 'checkup', 'visit'
+]
+
+# Meeting keywords that suggest it's NOT a task
+MEETING_KEYWORDS = [
+    'meeting', 'call', 'conference', 'discussion', 'standup',
+    'sync', 'review meeting', 'team', 'group', 'session', 'interview',
+    'presentation', 'demo', 'workshop', 'training', 'seminar'
+]
+
+# Task keywords explicit enough to mark an event as a task even with attendees
+EXPLICIT_TASK_KEYWORDS = ['deadline', 'due', 'submit', 'reminder', 'task', 'todo', 'to do']
+
+def _keyword_regex(keywords):
+    """Compile a keyword list into one alternation with plain substring semantics"""
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+
+_TASK_RE = _keyword_regex(TASK_KEYWORDS)
+_MEETING_RE = _keyword_regex(MEETING_KEYWORDS)
+_EXPLICIT_TASK_RE = _keyword_regex(EXPLICIT_TASK_KEYWORDS)
+
+@lru_cache(maxsize=2048)
+def _classify_calendar_event(title_lower, attendee_count):
+    """Keyword classification behind _is_calendar_event_a_task, memoized across dashboard renders"""
+    # If it clearly contains meeting keywords, treat as meeting
+    if _MEETING_RE.search(title_lower):
+        return False
+    
+    # Single-person events (no attendees) are tasks if they have any task keyword;
+    # explicit and personal-activity keywords are all part of TASK_KEYWORDS
+    if attendee_count == 0:
+        return bool(_TASK_RE.search(title_lower))
+    
+    # Events with attendees need a very explicit task keyword
+    return bool(_EXPLICIT_TASK_RE.search(title_lower))
+
+# Keyword fast-path for chat intent classification, checked before asking Claude
+_INTENT_PATTERNS = [
+    ('calendar', re.compile(r'\b(meetings?|schedul\w*|calendar|appointments?|availability|available|free time|book)\b')),
+    ('email', re.compile(r'\b(e-?mails?|inbox|unread|gmail|mail|reply|compose)\b')),
+    ('task', re.compile(r'\b(tasks?|todos?|to-?do|to do|reminders?)\b')),
+]
+
+@lru_cache(maxsize=512)
+def _classify_intent_with_llm(anthropic_client, normalized_message):
+    """Classify an ambiguous chat message with Claude, memoized per message"""
+    intent_prompt = f"""Analyze this user message and determine the intent:
+
+Message: "{normalized_message}"
+
+Classify into one of these categories:
+- calendar: scheduling, meetings, availability, appointments
+- email: checking emails, sending, replying, inbox management
+- task: creating tasks, managing todos, reminders
+- general: general questions or conversation
+
+Return just the category name."""
+
+    # A one-word label doesn't need Sonnet - Haiku answers faster and cheaper
+    response = anthropic_client.messages.create(
+        model="claude-haiku-4-5-20251001",
+        max_tokens=5,
+        stop_sequences=["\n"],
+        messages=[{"role": "user", "content": intent_prompt}]
+    )
+
+    # Handle different response content types properly
+    content = response.content[0]
+    if hasattr(content, 'text'):
+        return content.text.strip().lower()
+    else:
+        return str(content).strip().lower()
+
+# Chat reply when there is no usable Anthropic key
+_AI_UNAVAILABLE_TEXT = "AI service is not available. Please check your Anthropic API key configuration."
+
 class ExecutiveAssistantApp:
     """Main application class for the Executive Assistant"""
     
@@ -46,20 +227,38 @@ class ExecutiveAssistantApp:
         self.calendar_service = None
         self.gmail_service = None
         self.tasks_service = None
-        self.memory = ContextMemory()
+        self.credentials = None
+        self.memory = ContextMemory(storage_file=Config.CONTEXT_MEMORY_FILE)
         self.calendar_agent = None
+        self.email_agent = None
         self.authenticated = False
         
+        # Short-lived dashboard cache: (timestamp, cache key, payload)
+        self._dash_cache = (0.0, None, None)
+        self._dash_lock = threading.Lock()
+        
+        # Saved OAuth token, and the version of it behind the current credentials
+        self.token_store = TokenStore(Config.GOOGLE_TOKEN_FILE)
+        self._creds_mtime = None
+        
+        # Serializes service (re)builds; the event is cleared while a login finishes in the background
+        self._auth_lock = threading.Lock()
+        self._auth_ready = threading.Event()
+        self._auth_ready.set()
+        
         # Set up timezone
         try:
-            self.local_timezone = pytz.timezone(Config.DEFAULT_TIMEZONE)
+            self.local_timezone = ZoneInfo(Config.DEFAULT_TIMEZONE)
         except:
-            self.local_timezone = pytz.UTC
+            self.local_timezone = ZoneInfo("UTC")
             logger.warning("Using UTC timezone as fallback")
 
         # Initialize Anthropic client
         self._initialize_anthropic()
         
+        # Local task storage is available with or without Google
+        self.task_manager = TaskManager(self.anthropic_client, on_auth_error=self._disable_anthropic)
+        
         # Try to load existing Google credentials on startup
         self._load_existing_credentials()
 
@@ -72,48 +271,45 @@ class ExecutiveAssistantApp:
             self.anthropic_client = None
             return
         
+        if not api_key.startswith('sk-ant-'):
+            logger.warning("ANTHROPIC_API_KEY does not look like an Anthropic key - AI requests may fail")
+        
         try:
-            self.anthropic_client = anthropic.Anthropic(api_key=api_key)
-            
-            # Test the client with a simple request
-            test_response = self.anthropic_client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=10,
-                messages=[{"role": "user", "content": "Hello"}]
-            )
-            logger.info("✅ Anthropic client initialized successfully")
+            # The key is validated lazily on the first real request rather than
+            # with a warm-up call, which would add a full API round-trip to startup
+            # One shared client (and connection pool) per process for every agent
+            self.anthropic_client = get_anthropic_client()
+            logger.info("✅ Anthropic client initialized (API key present)")
             
         except Exception as e:
             logger.error(f"❌ Failed to initialize Anthropic client: {e}")
             self.anthropic_client = None
     
+    def _disable_anthropic(self, error):
+        """Turn off AI features after the API rejected our key"""
+        logger.error(f"❌ Anthropic API key rejected - AI features disabled: {error}")
+        self.anthropic_client = None
+        self.calendar_agent = None
+        self.email_agent = None
+        self.task_manager.client = None
+    
     def _load_existing_credentials(self):
         """Load existing Google credentials on startup if available"""
         try:
-            import pickle
-            import os
-            
-            token_path = 'credentials/token.pickle'
-            if os.path.exists(token_path):
-                with open(token_path, 'rb') as token:
-                    credentials = pickle.load(token)
+            token_mtime = self.token_store.version()
+            if token_mtime is not None:
+                # Skip re-parsing a token file we've already loaded
+                if self.authenticated and token_mtime == self._creds_mtime:
+                    return True
                 
-                # Check if credentials are still valid
-                if credentials and hasattr(credentials, 'valid'):
-                    if credentials.valid or (hasattr(credentials, 'refresh_token') and credentials.refresh_token):
-                        # Initialize Google services
-                        from google_backend import GoogleCalendarService, GmailService, GoogleTasksService, CalendarAgent
-                        
-                        self.calendar_service = GoogleCalendarService(credentials)
-                        self.gmail_service = GmailService(credentials)
-                        self.tasks_service = GoogleTasksService(credentials)
-                        
-                        if self.anthropic_client:
-                            self.calendar_agent = CalendarAgent(self.anthropic_client, self.calendar_service)
-                        
-                        self.authenticated = True
-                        logger.info("✅ Restored Google authentication from saved credentials")
-                        return True
+                credentials = Credentials.from_authorized_user_info(json.loads(self.token_store.get()), _GOOGLE_SCOPES)
+                
+                # Check if credentials are still valid (or can be refreshed)
+                if credentials.valid or credentials.refresh_token:
+                    self._initialize_google_services(credentials)
+                    self._creds_mtime = token_mtime
+                    logger.info("✅ Restored Google authentication from saved credentials")
+                    return True
                         
             logger.info("No valid saved credentials found - authentication required")
             return False
@@ -122,28 +318,67 @@ class ExecutiveAssistantApp:
             logger.warning(f"Could not load existing credentials: {e}")
             return False
 
+    def sync_google_services(self):
+        """Follow OAuth logins and disconnects made by other worker processes"""
+        # Let a login that is finishing in the background land first
+        self._auth_ready.wait(Config.AUTH_FINALIZE_TIMEOUT)
+        
+        if self.token_store.version() == self._creds_mtime:
+            return
+        
+        with self._auth_lock:
+            token_mtime = self.token_store.version()
+            if token_mtime == self._creds_mtime:
+                return
+            
+            if token_mtime is None:
+                logger.info("Saved Google token removed - disconnecting this worker")
+                self._clear_google_services()
+                return
+            
+            self._load_existing_credentials()
+            # Remember unusable tokens too, so they aren't re-parsed on every request
+            self._creds_mtime = token_mtime
+
+    def begin_google_auth(self, credentials):
+        """Save freshly exchanged OAuth credentials and build their services in the background"""
+        # The token is written before the popup returns, so a dashboard refresh that
+        # lands on another worker already finds it; only service construction is deferred
+        token_version = self.token_store.put(credentials.to_json())
+        self._auth_ready.clear()
+        _google_executor.submit(self._finalize_google_auth, credentials, token_version)
+
+    def _finalize_google_auth(self, credentials, token_version):
+        """Build the Google services for new, already saved credentials"""
+        try:
+            with self._auth_lock:
+                self._initialize_google_services(credentials)
+                self._creds_mtime = token_version
+            logger.info("✅ Google authentication completed successfully")
+        except Exception as e:
+            logger.error(f"❌ Failed to finish Google authentication: {e}")
+        finally:
+            self._auth_ready.set()
+
+    def _clear_google_services(self):
+        """Drop the Google services and in-memory credentials"""
+        self.authenticated = False
+        self.calendar_service = None
+        self.gmail_service = None
+        self.tasks_service = None
+        self.calendar_agent = None
+        self.email_agent = None
+        self.credentials = None
+        self._creds_mtime = None
+        self.invalidate_dashboard_cache()
+
     def authenticate_google(self):
         """Authenticate with Google services"""
         try:
             logger.info("Starting Google authentication...")
             creds = self.auth_manager.authenticate()
             
-            self.calendar_service = GoogleCalendarService(creds)
-            self.gmail_service = GmailService(creds)
-            
-            # Initialize Google Tasks service with error handling
-            try:
-                logger.info("🔄 Initializing Google Tasks service...")
-                self.tasks_service = GoogleTasksService(creds)
-                logger.info("✅ Google Tasks service initialized successfully")
-            except Exception as e:
-                logger.error(f"❌ Failed to initialize Google Tasks service: {e}")
-                self.tasks_service = None
-
-            if self.anthropic_client:
-                self.calendar_agent = CalendarAgent(self.anthropic_client, self.calendar_service)
-
-            self.authenticated = True
+            self._initialize_google_services(creds)
             logger.info("✅ Google services authenticated successfully")
             return True
             
@@ -151,17 +386,56 @@ class ExecutiveAssistantApp:
             logger.error(f"❌ Authentication failed: {e}")
             return False
 
+    def _initialize_google_services(self, credentials):
+        """Build the Google services from credentials and keep them in memory"""
+        self.credentials = credentials
+        self.calendar_service = GoogleCalendarService(credentials)
+        self.gmail_service = GmailService(credentials)
+        
+        # Initialize Google Tasks service with error handling
+        try:
+            logger.info("🔄 Initializing Google Tasks service...")
+            self.tasks_service = GoogleTasksService(credentials)
+            logger.info("✅ Google Tasks service initialized successfully")
+        except Exception as e:
+            logger.error(f"❌ Failed to initialize Google Tasks service: {e}")
+            self.tasks_service = None
+        
+        if self.anthropic_client:
+            self.calendar_agent = CalendarAgent(self.anthropic_client, self.calendar_service, on_auth_error=self._disable_anthropic)
+            self.email_agent = EmailInsightAgent(self.anthropic_client, self.gmail_service, on_auth_error=self._disable_anthropic)
+        
+        self.authenticated = True
+        self.invalidate_dashboard_cache()
+
+    def invalidate_dashboard_cache(self):
+        """Drop the cached dashboard payload so the next request re-fetches"""
+        with self._dash_lock:
+            self._dash_cache = (0.0, None, None)
+
     def get_dashboard_data(self):
-        """Get data for the dashboard"""
+        """Get data for the dashboard, reusing a recent payload when possible"""
+        # Held across the rebuild so concurrent dashboard requests share one fetch
+        with self._dash_lock:
+            cache_key = (self.authenticated, id(self.calendar_service), id(self.gmail_service), id(self.tasks_service))
+            cached_at, cached_key, cached_data = self._dash_cache
+            if cached_key == cache_key and time.monotonic() - cached_at < Config.DASHBOARD_CACHE_TTL:
+                logger.debug("Serving dashboard data from cache")
+                return cached_data
+            
+            data = self._build_dashboard_data()
+            if data.get('success'):
+                self._dash_cache = (time.monotonic(), cache_key, data)
+            return data
+
+    def _build_dashboard_data(self):
+        """Build the dashboard payload from Google services and local tasks"""
         logger.info(f"Dashboard request - authenticated: {self.authenticated}, calendar_service: {self.calendar_service is not None}, gmail_service: {self.gmail_service is not None}")
         
         if not self.authenticated:
             # Still provide task data and AI features even without Google
             tasks_count = 0
             try:
-                from task_manager import TaskManager
-                if not hasattr(self, 'task_manager'):
-                    self.task_manager = TaskManager(self.anthropic_client)
                 task_summary = self.task_manager.get_task_summary()
                 tasks_count = task_summary['pending']
             except Exception as e:
@@ -179,25 +453,49 @@ class ExecutiveAssistantApp:
         try:
             logger.info("Fetching dashboard data...")
             
+            # Fetch meetings, emails and Google Tasks concurrently - each is an
+            # independent round-trip to Google, so overlap the waits
+            meetings_future = None
+            if self.calendar_service:
+                meetings_future = _google_executor.submit(self.calendar_service.get_upcoming_events, max_results=50)
+
+            emails_future = None
+            if self.gmail_service:
+                emails_future = _google_executor.submit(self.gmail_service.get_messages, query='is:unread', max_results=20, metadata_only=True)
+
+            tasks_future = None
+            if self.tasks_service:
+                logger.info("🔄 Attempting to fetch Google Tasks...")
+                tasks_future = _google_executor.submit(self.tasks_service.get_todays_tasks)
+
+            # One shared deadline for the whole fan-out: a stalled fetch costs its section,
+            # not the dashboard lock that every other request and cache invalidation waits on
+            deadline = time.monotonic() + Config.DASHBOARD_FETCH_TIMEOUT
+
+            def remaining():
+                return max(0.0, deadline - time.monotonic())
+
             # Get meetings for the next 7 days
             meetings = []
-            if self.calendar_service:
-                # Get events from now until next week
-                from datetime import timedelta
-                next_week = datetime.utcnow() + timedelta(days=7)
-                meetings = self.calendar_service.get_upcoming_events(max_results=50)
+            if meetings_future:
+                try:
+                    meetings = meetings_future.result(timeout=remaining())
+                except Exception as e:
+                    logger.error(f"❌ Google Calendar fetch failed: {e}")
 
             # Get emails
             emails = []
-            if self.gmail_service:
-                emails = self.gmail_service.get_messages(query='is:unread', max_results=20)
+            if emails_future:
+                try:
+                    emails = emails_future.result(timeout=remaining())
+                except Exception as e:
+                    logger.error(f"❌ Gmail fetch failed: {e}")
 
             # Get Google Tasks
             google_tasks = []
-            if self.tasks_service:
+            if tasks_future:
                 try:
-                    logger.info("🔄 Attempting to fetch Google Tasks...")
-                    google_tasks = self.tasks_service.get_todays_tasks()
+                    google_tasks = tasks_future.result(timeout=remaining())
                     logger.info(f"✅ Successfully fetched {len(google_tasks)} Google Tasks")
                 except Exception as e:
                     logger.error(f"❌ Google Tasks API failed: {e}")
@@ -208,38 +506,28 @@ class ExecutiveAssistantApp:
             meetings_data = []
             calendar_tasks = []  # Tasks derived from calendar events
             
-            # Use a safe timezone fallback
-            try:
-                if hasattr(self, 'local_timezone') and self.local_timezone:
-                    today_local = datetime.now(self.local_timezone).date()
-                else:
-                    today_local = datetime.now().date()
-            except Exception:
-                today_local = datetime.now().date()
+            # Resolve the display timezone once for every meeting and email below
+            tz = self.local_timezone
+            now_local = datetime.now(tz)
+            today_local = now_local.date()
             today_meetings = []
 
             for meeting in meetings:
-                # Safe timezone conversion for meetings
-                try:
-                    if hasattr(self, 'local_timezone') and self.local_timezone and hasattr(meeting.date, 'astimezone'):
-                        meeting_local = meeting.date.astimezone(self.local_timezone)
-                    else:
-                        meeting_local = meeting.date
-                    meeting_local_date = meeting_local.date()
-                except Exception:
-                    meeting_local = meeting.date
-                    meeting_local_date = meeting.date.date() if hasattr(meeting.date, 'date') else meeting.date
+                meeting_local = meeting.date.astimezone(tz) if isinstance(meeting.date, datetime) else meeting.date
+                meeting_local_date = meeting_local.date()
+                
+                # Format once and slice: 'YYYY-MM-DDTHH:MM...' -> date and HH:MM
+                iso = meeting_local.isoformat()
+                date_str = iso[:10]
+                time_str = iso[11:16]
 
                 # Detect if this is a task (single person, task keywords, etc.)
-                is_task = self._is_calendar_event_a_task(meeting)
-                
-                if is_task:
+                if self._is_calendar_event_a_task(meeting):
                     # Add to calendar tasks
-                    priority = "High" if meeting_local_date <= today_local else "Medium"
                     calendar_tasks.append({
                         'title': meeting.title,
-                        'due_date': meeting_local.strftime('%Y-%m-%d %H:%M'),
-                        'priority': priority,
+                        'due_date': f"{date_str} {time_str}",
+                        'priority': "High" if meeting_local_date <= today_local else "Medium",
                         'source': 'calendar',
                         'completed': False
                     })
@@ -247,8 +535,8 @@ class ExecutiveAssistantApp:
                     # Add to meetings
                     meetings_data.append({
                         'title': meeting.title,
-                        'time': meeting_local.strftime('%H:%M'),
-                        'date': meeting_local.strftime('%Y-%m-%d'),
+                        'time': time_str,
+                        'date': date_str,
                         'attendees': meeting.attendees or [],
                         'duration': meeting.duration,
                         'location': meeting.location,
@@ -264,14 +552,7 @@ class ExecutiveAssistantApp:
             unread_emails = []
 
             for email in emails[:10]:  # Limit to 10 for display
-                # Safe timezone handling for emails
-                try:
-                    if hasattr(self, 'local_timezone') and self.local_timezone:
-                        email_local = email.timestamp.astimezone(self.local_timezone)
-                    else:
-                        email_local = email.timestamp
-                except Exception:
-                    email_local = email.timestamp
+                email_local = email.timestamp.astimezone(tz)
                 
                 emails_data.append({
                     'sender': email.sender,
@@ -313,7 +594,7 @@ class ExecutiveAssistantApp:
             if self.authenticated:
                 if len(today_meetings) == 0:
                     # No meetings - show available time based on current time of day
-                    current_hour = datetime.now().hour
+                    current_hour = now_local.hour
                     if current_hour < 9:
                         free_time_display = "Full day available"
                     elif current_hour < 17:
@@ -356,7 +637,6 @@ class ExecutiveAssistantApp:
 
         except Exception as e:
             logger.error(f"Error getting dashboard data: {e}")
-            import traceback
             logger.error(f"Full traceback: {traceback.format_exc()}")
             return {
                 'success': False,
@@ -374,51 +654,9 @@ class ExecutiveAssistantApp:
         Returns True only for clear personal tasks, not regular meetings.
         """
         try:
-            # Task keywords that strongly suggest personal tasks
-            task_keywords = [
-                'deadline', 'due', 'submit', 'reminder', 'task', 'todo', 'to do',
-                'finish', 'complete', 'draft', 'personal appointment', 'prep', 'prepare',
-                'bedtime', 'morning', 'workout', 'exercise', 'study', 'practice',
-                'clean', 'organize', 'shopping', 'errands', 'pick up', 'drop off',
-                'appointment', 'dentist', 'doctor', 'checkup', 'visit'
-            ]
-            
-            # Meeting keywords that suggest it's NOT a task
-            meeting_keywords = [
-                'meeting', 'call', 'conference', 'discussion', 'standup',
-                'sync', 'review meeting', 'team', 'group', 'session', 'interview',
-                'presentation', 'demo', 'workshop', 'training', 'seminar'
-            ]
-            
             title_lower = meeting.title.lower() if meeting.title else ""
-            
-            # If it clearly contains meeting keywords, treat as meeting
-            has_meeting_keywords = any(keyword in title_lower for keyword in meeting_keywords)
-            if has_meeting_keywords:
-                return False
-            
-            # Check if it's truly a single-person event (no attendees)
             attendee_count = len(meeting.attendees) if meeting.attendees else 0
-            is_single_person = attendee_count == 0
-            
-            # Check for task keywords
-            has_task_keywords = any(keyword in title_lower for keyword in task_keywords)
-            
-            # Consider it a task if:
-            # 1. It's single-person AND has task keywords, OR
-            # 2. It has very explicit task keywords (regardless of attendees), OR
-            # 3. It's single-person and likely a personal activity (short title, no location suggesting meeting room)
-            explicit_task_keywords = ['deadline', 'due', 'submit', 'reminder', 'task', 'todo', 'to do']
-            has_explicit_task_keywords = any(keyword in title_lower for keyword in explicit_task_keywords)
-            
-            # Personal activity patterns for single-person events
-            personal_activity_patterns = [
-                'prep', 'bedtime', 'morning', 'workout', 'exercise', 'study', 'practice',
-                'clean', 'organize', 'shopping', 'errands'
-            ]
-            has_personal_patterns = any(pattern in title_lower for pattern in personal_activity_patterns)
-            
-            return (is_single_person and has_task_keywords) or has_explicit_task_keywords or (is_single_person and has_personal_patterns)
+            return _classify_calendar_event(title_lower, attendee_count)
             
         except Exception as e:
             logger.error(f"Error determining if event is task: {e}")
@@ -429,7 +667,7 @@ class ExecutiveAssistantApp:
         if not self.anthropic_client:
             return {
                 'success': False,
-                'response': "AI service is not available. Please check your Anthropic API key configuration."
+                'response': _AI_UNAVAILABLE_TEXT
             }
 
         try:
@@ -439,22 +677,21 @@ class ExecutiveAssistantApp:
             # Determine intent
             intent = self._determine_intent(message)
             logger.info(f"Detected intent: {intent}")
+            
+            # Classification may just have found the API key rejected
+            if not self.anthropic_client:
+                return {
+                    'success': False,
+                    'response': _AI_UNAVAILABLE_TEXT
+                }
 
             # Route to appropriate handler with conversation context
             conversation_context = self.memory.get_context()
             
-            if intent == 'calendar' and self.calendar_agent:
-                result = self.calendar_agent.handle_request(message, context=conversation_context)
-                response_text = result.get('response', 'I encountered an error processing your calendar request.')
-                
-            elif intent == 'email':
-                response_text = self._handle_email_request(message, context=conversation_context)
-                
-            elif intent == 'task':
-                response_text = self._handle_task_request(message, context=conversation_context)
-                
-            else:
+            if self._is_general_intent(intent):
                 response_text = self._handle_general_request(message, context=conversation_context)
+            else:
+                response_text = self._handle_intent_request(intent, message, conversation_context)
 
             # Add assistant response to memory
             self.memory.add_message("assistant", response_text)
@@ -471,37 +708,84 @@ class ExecutiveAssistantApp:
                 'response': f"I encountered an error processing your message: {str(e)}"
             }
 
-    def _determine_intent(self, message):
-        """Determine the intent of the user message"""
+    def stream_chat_message(self, message):
+        """Process chat message using AI, yielding the response text as it is generated"""
+        if not self.anthropic_client:
+            yield _AI_UNAVAILABLE_TEXT
+            return
+
         try:
+            # Add user message to memory
+            self.memory.add_message("user", message)
+            
+            # Intent classification stays non-streaming - we need the whole answer to route
+            intent = self._determine_intent(message)
+            logger.info(f"Detected intent: {intent}")
+            
             if not self.anthropic_client:
-                return 'general'
-                
-            intent_prompt = f"""Analyze this user message and determine the intent:
+                yield _AI_UNAVAILABLE_TEXT
+                return
 
-Message: "{message}"
+            conversation_context = self.memory.get_context()
+            
+            if self._is_general_intent(intent):
+                chunks = []
+                for chunk in self._stream_general_request(message, context=conversation_context):
+                    chunks.append(chunk)
+                    yield chunk
+                response_text = "".join(chunks)
+            else:
+                # Action handlers (calendar, email, tasks) produce their answer in one piece
+                response_text = self._handle_intent_request(intent, message, conversation_context)
+                yield response_text
 
-Classify into one of these categories:
-- calendar: scheduling, meetings, availability, appointments
-- email: checking emails, sending, replying, inbox management
-- task: creating tasks, managing todos, reminders
-- general: general questions or conversation
+            # Add assistant response to memory
+            self.memory.add_message("assistant", response_text)
 
-Return just the category name."""
+        except Exception as e:
+            logger.error(f"Error streaming chat message: {e}")
+            yield f"I encountered an error processing your message: {str(e)}"
+
+    def _is_general_intent(self, intent):
+        """Whether a message with this intent goes to the general conversation handler"""
+        if intent == 'calendar':
+            return not self.calendar_agent
+        return intent not in ('email', 'task')
+
+    def _handle_intent_request(self, intent, message, conversation_context):
+        """Run a calendar, email or task request and return the response text"""
+        if intent == 'calendar':
+            result = self.calendar_agent.handle_request(message, context=conversation_context)
+            response_text = result.get('response', 'I encountered an error processing your calendar request.')
+            
+        elif intent == 'email':
+            response_text = self._handle_email_request(message, context=conversation_context)
+            
+        else:
+            response_text = self._handle_task_request(message, context=conversation_context)
 
-            response = self.anthropic_client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=50,
-                messages=[{"role": "user", "content": intent_prompt}]
-            )
+        # Calendar, email and task requests may have changed what the dashboard shows
+        self.invalidate_dashboard_cache()
+        return response_text
 
-            # Handle different response content types properly
-            content = response.content[0]
-            if hasattr(content, 'text'):
-                return content.text.strip().lower()
-            else:
-                return str(content).strip().lower()
+    def _determine_intent(self, message):
+        """Determine the intent of the user message"""
+        try:
+            if not self.anthropic_client:
+                return 'general'
+            
+            # Most messages name their topic outright - only ask Claude when
+            # the keywords are missing or point at more than one category
+            normalized_message = message.strip().lower()
+            matched_intents = [intent for intent, pattern in _INTENT_PATTERNS if pattern.search(normalized_message)]
+            if len(matched_intents) == 1:
+                return matched_intents[0]
             
+            return _classify_intent_with_llm(self.anthropic_client, normalized_message)
+            
+        except anthropic.AuthenticationError as e:
+            self._disable_anthropic(e)
+            return 'general'
         except Exception as e:
             logger.error(f"Error determining intent: {e}")
             return 'general'
@@ -540,7 +824,7 @@ Return just the category name."""
         try:
             # Check for urgent emails specifically
             if 'urgent' in message.lower():
-                emails = self.gmail_service.get_messages(query='is:unread', max_results=10)
+                emails = self.gmail_service.get_messages(query='is:unread', max_results=10, metadata_only=True)
                 
                 if not emails:
                     return "You have no unread emails! Your inbox is clear."
@@ -556,33 +840,28 @@ Return just the category name."""
                 if not urgent_emails:
                     return f"I checked your {len(emails)} unread emails and found no urgent messages. All emails appear to be routine communications from Google and other services."
                 
-                response = f"🚨 Found {len(urgent_emails)} urgent emails:\n\n"
-                for i, email in enumerate(urgent_emails, 1):
-                    response += f"{i}. **{email.subject}**\n"
-                    response += f"   From: {email.sender}\n"
-                    response += f"   Priority: {email.priority}\n\n"
-                
-                return response
+                return f"🚨 Found {len(urgent_emails)} urgent emails:\n\n" + self._format_email_list(urgent_emails)
             
             # Default to showing unread emails
             else:
-                emails = self.gmail_service.get_messages(query='is:unread', max_results=5)
+                emails = self.gmail_service.get_messages(query='is:unread', max_results=5, metadata_only=True)
                 
                 if not emails:
                     return "You have no unread emails! Your inbox is clear."
 
-                response = f"You have {len(emails)} unread emails:\n\n"
-                for i, email in enumerate(emails, 1):
-                    response += f"{i}. **{email.subject}**\n"
-                    response += f"   From: {email.sender}\n"
-                    response += f"   Priority: {email.priority}\n\n"
-
-                return response
+                return f"You have {len(emails)} unread emails:\n\n" + self._format_email_list(emails)
                 
         except Exception as e:
             logger.error(f"Error checking emails: {e}")
             return f"Error checking emails: {str(e)}"
 
+    def _format_email_list(self, emails):
+        """Format emails as a numbered list for chat responses"""
+        return "".join(
+            f"{i}. **{email.subject}**\n   From: {email.sender}\n   Priority: {email.priority}\n\n"
+            for i, email in enumerate(emails, 1)
+        )
+
     def _handle_send_email_request(self, message, context=None):
         """Handle email sending requests using AI to parse details"""
         try:
@@ -616,12 +895,10 @@ Extract the recipient email, generate an appropriate subject if not provided, an
                 response_text = str(response.content[0])
             
             # Parse JSON response
-            import json
             try:
                 email_details = json.loads(response_text.strip())
             except json.JSONDecodeError:
                 # Try to extract JSON from the response if it's wrapped in text
-                import re
                 json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
                 if json_match:
                     email_details = json.loads(json_match.group())
@@ -649,6 +926,9 @@ Extract the recipient email, generate an appropriate subject if not provided, an
                 logger.error(f"Error sending email: {e}")
                 return f"Error sending email: {str(e)}"
                 
+        except anthropic.AuthenticationError as e:
+            self._disable_anthropic(e)
+            return _AI_UNAVAILABLE_TEXT
         except Exception as e:
             logger.error(f"Error parsing email request: {e}")
             return f"Error processing email request: {str(e)}"
@@ -658,7 +938,7 @@ Extract the recipient email, generate an appropriate subject if not provided, an
         try:
             self.memory.add_message("user", message)
             
-            if not hasattr(self, 'tasks_service') or not self.tasks_service:
+            if not self.tasks_service:
                 return "Google Tasks is not connected. Please authenticate with Google first."
             
             if any(word in message.lower() for word in ['create', 'creat', 'add', 'new', 'make']) or 'task' in message.lower():
@@ -691,7 +971,6 @@ Extract and return ONLY a JSON object like this:
                     extraction_text = response.content[0].text if hasattr(response.content[0], 'text') else str(response.content[0])
                     
                     # Parse JSON
-                    import json, re
                     json_match = re.search(r'\{.*\}', extraction_text, re.DOTALL)
                     if json_match:
                         task_data = json.loads(json_match.group())
@@ -699,7 +978,6 @@ Extract and return ONLY a JSON object like this:
                         # Create task in Google Tasks
                         due_date = task_data.get('due_date')
                         if due_date:
-                            from datetime import datetime
                             due_date = datetime.strptime(due_date, '%Y-%m-%d')
                         
                         task_id = self.tasks_service.create_task(
@@ -715,6 +993,9 @@ Extract and return ONLY a JSON object like this:
                         else:
                             return "Failed to create task in Google Tasks. Please try again."
                     
+                except anthropic.AuthenticationError as e:
+                    self._disable_anthropic(e)
+                    return _AI_UNAVAILABLE_TEXT
                 except Exception as e:
                     logger.error(f"Error creating task: {e}")
                     logger.error(f"Task creation failed for message: {message}")
@@ -797,42 +1078,44 @@ Extract and return ONLY a JSON object like this:
             logger.error(f"Error handling task request: {e}")
             return f"Error managing tasks: {str(e)}"
 
-    def _handle_general_request(self, message, context=None):
-        """Handle general conversation requests"""
-        try:
-            from datetime import datetime
-            import pytz
-            
-            # Get current date and time in user's timezone
-            user_tz = pytz.timezone('Europe/London')  # BST/UTC+1
-            now = datetime.now(user_tz)
-            today_str = now.strftime("%A, %B %d, %Y")
-            current_time_str = now.strftime("%I:%M %p %Z")
-            
-            context = f"\n\nCurrent date and time: Today is {today_str} at {current_time_str}."
-            
-            if self.authenticated:
-                context += "\n\nYou have access to the user's Google Calendar and Gmail services."
-            else:
-                context += "\n\nNote: The user hasn't connected their Google services yet. You can help them with general questions and guide them to connect Google for calendar and email features."
-
-            # Get conversation context
-            conversation_context = context if context else self.memory.get_context()
-            context_str = ""
-            if conversation_context:
-                context_str = "\n\nRecent conversation:\n"
-                for msg in conversation_context[-6:]:  # Last 6 messages for better context
-                    if isinstance(msg, dict):
-                        role = msg.get('role', 'unknown')
-                        content = msg.get('content', '')[:150]  # Truncate long messages
-                        context_str += f"{role}: {content}...\n"
+    def _build_general_prompt(self, message, context=None):
+        """Build the prompt for a general conversation request"""
+        
+        # Get current date and time in user's timezone
+        user_tz = ZoneInfo('Europe/London')  # BST/UTC+1
+        now = datetime.now(user_tz)
+        today_str = now.strftime("%A, %B %d, %Y")
+        current_time_str = now.strftime("%I:%M %p %Z")
+        
+        session_context = f"\n\nCurrent date and time: Today is {today_str} at {current_time_str}."
+        
+        if self.authenticated:
+            session_context += "\n\nYou have access to the user's Google Calendar and Gmail services."
+        else:
+            session_context += "\n\nNote: The user hasn't connected their Google services yet. You can help them with general questions and guide them to connect Google for calendar and email features."
+
+        # Get conversation context
+        conversation_context = context if context else self.memory.get_context()
+        context_str = ""
+        if conversation_context:
+            # Last 6 messages for better context, long messages truncated
+            context_str = "\n\nRecent conversation:\n" + "".join(
+                f"{msg.get('role', 'unknown')}: {msg.get('content', '')[:150]}...\n"
+                for msg in conversation_context[-6:]
+                if isinstance(msg, dict)
+            )
 
-            prompt = f"""You are IntelliAssist, a helpful AI executive assistant. Be conversational and remember what we've discussed. {context}{context_str}
+        return f"""You are IntelliAssist, a helpful AI executive assistant. Be conversational and remember what we've discussed. {session_context}{context_str}
 
 User message: {message}
 
 Provide a helpful, conversational response that builds on our previous discussion."""
 
+    def _handle_general_request(self, message, context=None):
+        """Handle general conversation requests"""
+        try:
+            prompt = self._build_general_prompt(message, context)
+
             response = self.anthropic_client.messages.create(
                 model="claude-sonnet-4-20250514",
                 max_tokens=300,
@@ -845,13 +1128,44 @@ Provide a helpful, conversational response that builds on our previous discussio
             else:
                 return str(response.content[0])
             
+        except anthropic.AuthenticationError as e:
+            self._disable_anthropic(e)
+            return _AI_UNAVAILABLE_TEXT
         except Exception as e:
             logger.error(f"Error handling general request: {e}")
             return "I'm here to help! Ask me about your calendar, emails, or anything else."
 
+    def _stream_general_request(self, message, context=None):
+        """Handle general conversation requests, yielding text as Claude produces it"""
+        streamed_any = False
+        try:
+            prompt = self._build_general_prompt(message, context)
+
+            with self.anthropic_client.messages.stream(
+                model="claude-sonnet-4-20250514",
+                max_tokens=300,
+                messages=[{"role": "user", "content": prompt}]
+            ) as stream:
+                for text in stream.text_stream:
+                    streamed_any = True
+                    yield text
+            
+        except anthropic.AuthenticationError as e:
+            self._disable_anthropic(e)
+            yield _AI_UNAVAILABLE_TEXT
+        except Exception as e:
+            logger.error(f"Error streaming general request: {e}")
+            if not streamed_any:
+                yield "I'm here to help! Ask me about your calendar, emails, or anything else."
+
 # Create global app instance
 assistant_app = ExecutiveAssistantApp()
 
+@app.before_request
+def sync_google_auth():
+    """Pick up Google logins and disconnects made in other worker processes"""
+    assistant_app.sync_google_services()
+
 # Flask routes
 @app.route('/')
 def index():
@@ -879,38 +1193,30 @@ def authenticate_google():
                 'message': 'Already authenticated with Google'
             })
         
-        # Generate OAuth URL for web-based flow
-        from google_auth_oauthlib.flow import Flow
-        from config import Config
-        
         # Create flow for web application
-        flow = Flow.from_client_secrets_file(
-            'credentials/credentials.json',
-            scopes=Config.GOOGLE_SCOPES
-        )
+        flow = Flow.from_client_config(_google_client_config(), scopes=_GOOGLE_SCOPES)
         
         # Use the current domain for redirect URL
-        domain = request.headers.get('Host', os.environ.get('REPLIT_DEV_DOMAIN', 'localhost:5000'))
-        redirect_uri = f"https://{domain}/google_callback"
+        redirect_uri = f"https://{request.headers.get('Host', _DEFAULT_DOMAIN)}{_REDIRECT_PATH}"
         flow.redirect_uri = redirect_uri
         
         # Log the redirect URI for debugging
         logger.info(f"OAuth redirect URI: {redirect_uri}")
         
+        # The state carries the redirect URI, signed and timestamped for the callback
+        state = _oauth_state_serializer.dumps({
+            'nonce': secrets.token_urlsafe(16),
+            'redirect_uri': redirect_uri
+        })
+        
         # Generate authorization URL with account selection
         authorization_url, state = flow.authorization_url(
             access_type='offline',
             include_granted_scopes='true',
-            prompt='select_account consent'
+            prompt='select_account consent',
+            state=state
         )
         
-        # Store the state in session for security
-        session['oauth_state'] = state
-        session['oauth_flow'] = {
-            'redirect_uri': redirect_uri,
-            'scopes': Config.GOOGLE_SCOPES
-        }
-        
         return jsonify({
             'success': True,
             'authenticated': False,
@@ -927,7 +1233,37 @@ def authenticate_google():
             'error': f'Failed to start OAuth flow: {str(e)}'
         }), 500
 
-@app.route('/google_callback')
+# Page shown in the OAuth popup once Google authentication completes
+_AUTH_SUCCESS_HTML = """\
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Authentication Complete</title>
+    <style>
+        body { font-family: Arial, sans-serif; text-align: center; padding: 50px; }
+        .success { color: #4CAF50; font-size: 18px; }
+    </style>
+</head>
+<body>
+    <div class="success">
+        <h2>✅ Authentication Successful!</h2>
+        <p>You can close this window. Returning to IntelliAssist...</p>
+    </div>
+    <script>
+        // Notify parent window of successful authentication
+        if (window.opener) {
+            window.opener.postMessage('auth_success', '*');
+        }
+        // Close popup after a brief delay
+        setTimeout(() => {
+            window.close();
+        }, 2000);
+    </script>
+</body>
+</html>
+""".encode('utf-8')
+
+@app.route(_REDIRECT_PATH)
 def google_callback():
     """Handle Google OAuth callback"""
     try:
@@ -936,14 +1272,12 @@ def google_callback():
         if not state:
             return "Missing OAuth state parameter. Please restart authentication.", 400
             
-        # Verify state parameter for security (with fallback if session issues)
-        stored_state = session.get('oauth_state')
-        if stored_state and state != stored_state:
-            logger.warning(f"OAuth state mismatch. Expected: {stored_state}, Got: {state}")
+        # Verify the signed state parameter for security
+        try:
+            oauth_state = _oauth_state_serializer.loads(state, max_age=Config.OAUTH_STATE_MAX_AGE)
+        except BadSignature as e:
+            logger.warning(f"Invalid or expired OAuth state: {e}")
             return "OAuth state mismatch. Please restart authentication.", 400
-        elif not stored_state:
-            logger.warning(f"No stored OAuth state in session. Proceeding with OAuth completion anyway...")
-            # Continue without strict state validation as fallback
             
         # Get authorization code
         code = request.args.get('code')
@@ -952,77 +1286,21 @@ def google_callback():
             return f"OAuth error: {error}", 400
             
         # Complete the OAuth flow
-        from google_auth_oauthlib.flow import Flow
-        from config import Config
-        import pickle
-        
-        flow = Flow.from_client_secrets_file(
-            'credentials/credentials.json',
-            scopes=Config.GOOGLE_SCOPES
-        )
+        flow = Flow.from_client_config(_google_client_config(), scopes=_GOOGLE_SCOPES)
         
-        # Get redirect URI from session or reconstruct it
-        oauth_flow = session.get('oauth_flow', {})
-        if 'redirect_uri' in oauth_flow:
-            flow.redirect_uri = oauth_flow['redirect_uri']
-        else:
-            # Fallback: reconstruct redirect URI from current request
-            domain = request.headers.get('Host', os.environ.get('REPLIT_DEV_DOMAIN', 'localhost:5000'))
-            flow.redirect_uri = f"https://{domain}/google_callback"
-            logger.info(f"Using fallback redirect URI: {flow.redirect_uri}")
+        # Use the redirect URI the flow was started with
+        flow.redirect_uri = oauth_state['redirect_uri']
         
         # Exchange code for credentials
         flow.fetch_token(code=code)
         credentials = flow.credentials
         
-        # Save credentials for future use
-        with open('credentials/token.pickle', 'wb') as token:
-            pickle.dump(credentials, token)
-            
-        # Initialize Google services
-        assistant_app.calendar_service = GoogleCalendarService(credentials)
-        assistant_app.gmail_service = GmailService(credentials)
-        
-        if assistant_app.anthropic_client:
-            assistant_app.calendar_agent = CalendarAgent(assistant_app.anthropic_client, assistant_app.calendar_service)
-        
-        assistant_app.authenticated = True
-        
-        # Clear session data
-        session.pop('oauth_state', None)
-        session.pop('oauth_flow', None)
-        
-        logger.info("✅ Google authentication completed successfully")
+        # Save credentials now and initialize Google services without holding up the popup;
+        # requests arriving on this worker meanwhile wait briefly for that to finish
+        assistant_app.begin_google_auth(credentials)
         
         # Return a simple HTML page that closes the popup and notifies the parent
-        return '''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Authentication Complete</title>
-            <style>
-                body { font-family: Arial, sans-serif; text-align: center; padding: 50px; }
-                .success { color: #4CAF50; font-size: 18px; }
-            </style>
-        </head>
-        <body>
-            <div class="success">
-                <h2>✅ Authentication Successful!</h2>
-                <p>You can close this window. Returning to IntelliAssist...</p>
-            </div>
-            <script>
-                // Notify parent window of successful authentication
-                if (window.opener) {
-                    window.opener.postMessage('auth_success', '*');
-                }
-                // Close popup after a brief delay
-                setTimeout(() => {
-                    window.close();
-                }, 2000);
-            </script>
-        </body>
-        </html>
-        '''
+        return Response(_AUTH_SUCCESS_HTML, mimetype='text/html')
         
     except Exception as e:
         logger.error(f"OAuth callback error: {e}")
@@ -1045,23 +1323,52 @@ def get_dashboard():
             'stats': {'meetings': 0, 'emails': 0, 'tasks': 0, 'free_time': 0}
         }), 500
 
+def _request_json():
+    """Parse the request body as a JSON object, or return None"""
+    try:
+        data = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+def _request_message():
+    """Return the stripped chat message from the request body, or None if missing"""
+    data = _request_json()
+    message = data.get('message') if data else None
+    if not isinstance(message, str):
+        return None
+    return message.strip()
+
+def _json_response(body, status=200):
+    """Wrap a pre-serialized JSON body in a fresh Response"""
+    return Response(body, status=status, mimetype='application/json')
+
+def _error_body(error):
+    """Serialize a fixed error message once, for reuse by every request that hits it"""
+    return orjson.dumps({'success': False, 'error': error})
+
+# Pre-serialized bodies for the fixed-text validation and availability errors
+_MESSAGE_REQUIRED = _error_body('Message is required')
+_MESSAGE_EMPTY = _error_body('Message cannot be empty')
+_NO_DATA = _error_body('No data provided')
+_TASK_TITLE_REQUIRED = _error_body('Task title required')
+_TASK_TITLE_IS_REQUIRED = _error_body('Task title is required')
+_TASK_ID_REQUIRED = _error_body('Task ID required')
+_EMAIL_ID_REQUIRED = _error_body('Email ID required')
+_EVENT_ID_REQUIRED = _error_body('Event ID required')
+_TASKS_UNAVAILABLE = _error_body('Google Tasks not available')
+_GMAIL_UNAVAILABLE = _error_body('Gmail not available')
+_CALENDAR_UNAVAILABLE = _error_body('Google Calendar not available')
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Process chat message"""
     try:
-        data = request.get_json()
-        if not data or 'message' not in data:
-            return jsonify({
-                'success': False,
-                'error': 'Message is required'
-            }), 400
-
-        message = data['message'].strip()
+        message = _request_message()
+        if message is None:
+            return _json_response(_MESSAGE_REQUIRED, 400)
         if not message:
-            return jsonify({
-                'success': False,
-                'error': 'Message cannot be empty'
-            }), 400
+            return _json_response(_MESSAGE_EMPTY, 400)
 
         result = assistant_app.process_chat_message(message)
         return jsonify(result)
@@ -1073,72 +1380,82 @@ def chat():
             'error': str(e)
         }), 500
 
-@app.route('/api/status', methods=['GET'])
-def get_status():
-    """Get application status"""
-    return jsonify({
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Process chat message, streaming the response as Server-Sent Events"""
+    try:
+        message = _request_message()
+        if message is None:
+            return _json_response(_MESSAGE_REQUIRED, 400)
+        if not message:
+            return _json_response(_MESSAGE_EMPTY, 400)
+
+        def generate():
+            for chunk in assistant_app.stream_chat_message(message):
+                yield f"data: {orjson.dumps({'delta': chunk}).decode()}\n\n"
+            yield f"data: {orjson.dumps({'done': True}).decode()}\n\n"
+
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        
+    except Exception as e:
+        logger.error(f"Chat stream error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def _status_payload():
+    """Build the /api/status payload"""
+    return {
         'authenticated': assistant_app.authenticated,
         'ai_available': assistant_app.anthropic_client is not None,
         'services': {
             'calendar': assistant_app.calendar_service is not None,
             'gmail': assistant_app.gmail_service is not None
         }
-    })
+    }
+
+@app.route('/api/status', methods=['GET'])
+def get_status():
+    """Get application status"""
+    return jsonify(_status_payload())
+
+@_ttl_cache(ttl=30)
+def _cached_task_summary():
+    """Task summary for smart suggestions, shared between polling clients"""
+    return assistant_app.task_manager.get_task_summary()
+
+def _smart_suggestions_payload():
+    """Build the /api/smart-suggestions payload"""
+    if not assistant_app.anthropic_client:
+        return {'success': False, 'error': 'AI not available'}
+    
+    # Time-based suggestions
+    suggestions = list(_HOUR_SUGGESTIONS[datetime.now().hour])
+    
+    # Add task-related suggestions
+    try:
+        task_summary = _cached_task_summary()
+        if task_summary['overdue'] > 0:
+            suggestions.insert(0, f"Review {task_summary['overdue']} overdue tasks")
+        if task_summary['due_today'] > 0:
+            suggestions.insert(0, f"Complete {task_summary['due_today']} tasks due today")
+    except Exception as e:
+        logger.warning(f"Could not load task suggestions: {e}")
+    
+    return {
+        'success': True, 
+        'suggestions': suggestions[:4]
+    }
 
 @app.route('/api/smart-suggestions', methods=['GET'])
 def get_smart_suggestions():
     """Generate smart suggestions based on current context"""
     try:
-        if not assistant_app.anthropic_client:
-            return jsonify({'success': False, 'error': 'AI not available'})
-        
-        suggestions = []
-        current_hour = datetime.now().hour
-        
-        # Time-based suggestions
-        if 8 <= current_hour <= 10:
-            suggestions.extend([
-                "Check my unread emails from yesterday",
-                "What meetings do I have today?",
-                "Review my priority tasks for this morning"
-            ])
-        elif 11 <= current_hour <= 13:
-            suggestions.extend([
-                "Schedule lunch meeting next week",
-                "Review afternoon calendar", 
-                "Send follow-up emails from morning meetings"
-            ])
-        elif 14 <= current_hour <= 17:
-            suggestions.extend([
-                "Plan tomorrow's priorities",
-                "Check for urgent emails",
-                "Schedule end-of-week review"
-            ])
-        else:
-            suggestions.extend([
-                "Review today's accomplishments",
-                "Prepare agenda for tomorrow",
-                "Schedule follow-up tasks"
-            ])
-        
-        # Add task-related suggestions
-        try:
-            from task_manager import TaskManager
-            if not hasattr(assistant_app, 'task_manager'):
-                assistant_app.task_manager = TaskManager(assistant_app.anthropic_client)
-            
-            task_summary = assistant_app.task_manager.get_task_summary()
-            if task_summary['overdue'] > 0:
-                suggestions.insert(0, f"Review {task_summary['overdue']} overdue tasks")
-            if task_summary['due_today'] > 0:
-                suggestions.insert(0, f"Complete {task_summary['due_today']} tasks due today")
-        except Exception as e:
-            logger.warning(f"Could not load task suggestions: {e}")
-        
-        return jsonify({
-            'success': True, 
-            'suggestions': suggestions[:4]
-        })
+        return jsonify(_smart_suggestions_payload())
         
     except Exception as e:
         logger.error(f"Error generating smart suggestions: {e}")
@@ -1148,10 +1465,6 @@ def get_smart_suggestions():
 def get_tasks():
     """Get priority tasks"""
     try:
-        if not hasattr(assistant_app, 'task_manager'):
-            from task_manager import TaskManager
-            assistant_app.task_manager = TaskManager(assistant_app.anthropic_client)
-        
         pending_tasks = assistant_app.task_manager.get_pending_tasks()
         
         # Convert to format expected by frontend
@@ -1175,17 +1488,15 @@ def get_tasks():
 def complete_task():
     """Mark a task as completed"""
     try:
-        data = request.get_json()
+        data = _request_json() or {}
         task_title = data.get('title')
         
         if not task_title:
-            return jsonify({'success': False, 'error': 'Task title required'})
-        
-        if not hasattr(assistant_app, 'task_manager'):
-            from task_manager import TaskManager
-            assistant_app.task_manager = TaskManager(assistant_app.anthropic_client)
+            return _json_response(_TASK_TITLE_REQUIRED)
         
         result = assistant_app.task_manager.complete_task(task_title)
+        assistant_app.invalidate_dashboard_cache()
+        _cached_task_summary.invalidate()
         return jsonify(result)
         
     except Exception as e:
@@ -1196,17 +1507,19 @@ def complete_task():
 def delete_task():
     """Delete a Google Task"""
     try:
-        data = request.get_json()
+        data = _request_json() or {}
         task_id = data.get('task_id')
         
         if not task_id:
-            return jsonify({'success': False, 'error': 'Task ID required'})
+            return _json_response(_TASK_ID_REQUIRED)
         
         if not assistant_app.authenticated or not assistant_app.tasks_service:
-            return jsonify({'success': False, 'error': 'Google Tasks not available'})
+            return _json_response(_TASKS_UNAVAILABLE)
         
         # Delete the task using Google Tasks API
         assistant_app.tasks_service.delete_task(task_id)
+        assistant_app.invalidate_dashboard_cache()
+        _cached_task_summary.invalidate()
         
         return jsonify({
             'success': True,
@@ -1221,17 +1534,18 @@ def delete_task():
 def delete_email():
     """Delete an email (move to trash)"""
     try:
-        data = request.get_json()
+        data = _request_json() or {}
         email_id = data.get('email_id')
         
         if not email_id:
-            return jsonify({'success': False, 'error': 'Email ID required'})
+            return _json_response(_EMAIL_ID_REQUIRED)
         
         if not assistant_app.authenticated or not assistant_app.gmail_service:
-            return jsonify({'success': False, 'error': 'Gmail not available'})
+            return _json_response(_GMAIL_UNAVAILABLE)
         
         # Delete the email using Gmail API
         assistant_app.gmail_service.delete_message(email_id)
+        assistant_app.invalidate_dashboard_cache()
         
         return jsonify({
             'success': True,
@@ -1246,17 +1560,18 @@ def delete_email():
 def delete_meeting():
     """Delete a calendar meeting"""
     try:
-        data = request.get_json()
+        data = _request_json() or {}
         event_id = data.get('event_id')
         
         if not event_id:
-            return jsonify({'success': False, 'error': 'Event ID required'})
+            return _json_response(_EVENT_ID_REQUIRED)
         
         if not assistant_app.authenticated or not assistant_app.calendar_service:
-            return jsonify({'success': False, 'error': 'Google Calendar not available'})
+            return _json_response(_CALENDAR_UNAVAILABLE)
         
         # Delete the event using Google Calendar API
         assistant_app.calendar_service.delete_event(event_id)
+        assistant_app.invalidate_dashboard_cache()
         
         return jsonify({
             'success': True,
@@ -1267,76 +1582,145 @@ def delete_meeting():
         logger.error(f"Delete meeting error: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+@_ttl_cache(ttl=60)
+def _cached_mock_emails_json():
+    """Demo priority emails as a ready-to-send JSON body, rebuilt at most once a minute"""
+    now = datetime.now()
+    mock_emails = [
+        {
+            'subject': 'Urgent: Project Deadline Update',
+            'sender': 'project.manager@company.com',
+            'timestamp': now,
+            'priority': 'Urgent',
+            'gmail_id': 'mock_1'
+        },
+        {
+            'subject': 'Important: Client Meeting Rescheduled',
+            'sender': 'client.relations@company.com',
+            'timestamp': now - timedelta(hours=2),
+            'priority': 'Important',
+            'gmail_id': 'mock_2'
+        },
+        {
+            'subject': 'New Budget Proposal for Review',
+            'sender': 'finance@company.com',
+            'timestamp': now - timedelta(hours=4),
+            'priority': 'Important',
+            'gmail_id': 'mock_3'
+        }
+    ]
+    return orjson.dumps({'success': True, 'emails': mock_emails})
+
+# AI priority analyses keyed by the set of analysed message ids: key -> (result, expires_at)
+_email_analysis_cache = {}
+_email_analysis_locks = {}
+_email_analysis_guard = threading.Lock()
+
+def _email_set_key(emails):
+    """Stable digest of the Gmail ids in an email list, independent of order"""
+    ids = sorted((email.gmail_id or '').encode() for email in emails)
+    return hashlib.blake2b(b'\0'.join(ids), digest_size=16).digest()
+
+def _analyze_emails_cached(email_agent, emails):
+    """Run the AI email analysis at most once per unread set and TTL window
+
+    Concurrent callers for the same set wait on one lock, so simultaneous
+    pollers share a single Anthropic request.
+    """
+    key = _email_set_key(emails)
+    now = time.monotonic()
+    with _email_analysis_guard:
+        # Drop expired analyses along with their locks
+        for stale_key in [k for k, (_, expires_at) in _email_analysis_cache.items() if expires_at <= now]:
+            del _email_analysis_cache[stale_key]
+            _email_analysis_locks.pop(stale_key, None)
+        key_lock = _email_analysis_locks.setdefault(key, threading.Lock())
+    
+    with key_lock:
+        cached = _email_analysis_cache.get(key)
+        if cached and time.monotonic() < cached[1]:
+            return cached[0]
+        
+        analysis = email_agent.analyze_emails(emails)
+        with _email_analysis_guard:
+            if analysis.get('success'):
+                _email_analysis_cache[key] = (analysis, time.monotonic() + Config.EMAIL_ANALYSIS_CACHE_TTL)
+            elif key not in _email_analysis_cache:
+                # Nothing cached means no expiry would ever prune this key's lock
+                _email_analysis_locks.pop(key, None)
+        return analysis
+
+def _priority_emails_payload():
+    """Build the /api/priority-emails payload"""
+    if not assistant_app.authenticated or not assistant_app.gmail_service:
+        # Mock priority emails for demo when not connected
+        return orjson.loads(_cached_mock_emails_json())
+    
+    # Get recent emails
+    emails = assistant_app.gmail_service.get_messages('is:unread', max_results=20, metadata_only=True)
+    
+    # Use AI to analyze and prioritize emails
+    priority_emails = []
+    if assistant_app.email_agent and emails:
+        analysis = _analyze_emails_cached(assistant_app.email_agent, emails)
+        priority_emails = analysis.get('priority_emails', [])
+    
+    return {'success': True, 'emails': priority_emails}
+
 @app.route('/api/priority-emails', methods=['GET'])
 def get_priority_emails():
     """Get priority emails based on AI analysis"""
     try:
         if not assistant_app.authenticated or not assistant_app.gmail_service:
             # Return mock priority emails for demo when not connected
-            mock_emails = [
-                {
-                    'subject': 'Urgent: Project Deadline Update',
-                    'sender': 'project.manager@company.com',
-                    'timestamp': datetime.now().isoformat(),
-                    'priority': 'Urgent',
-                    'gmail_id': 'mock_1'
-                },
-                {
-                    'subject': 'Important: Client Meeting Rescheduled',
-                    'sender': 'client.relations@company.com',
-                    'timestamp': (datetime.now() - timedelta(hours=2)).isoformat(),
-                    'priority': 'Important',
-                    'gmail_id': 'mock_2'
-                },
-                {
-                    'subject': 'New Budget Proposal for Review',
-                    'sender': 'finance@company.com',
-                    'timestamp': (datetime.now() - timedelta(hours=4)).isoformat(),
-                    'priority': 'Important',
-                    'gmail_id': 'mock_3'
-                }
-            ]
-            return jsonify({'success': True, 'emails': mock_emails})
-        
-        # Get recent emails
-        emails = assistant_app.gmail_service.get_messages('is:unread', max_results=20)
-        
-        # Use AI to analyze and prioritize emails
-        priority_emails = []
-        if assistant_app.anthropic_client and emails:
-            from task_manager import EmailInsightAgent
-            if not hasattr(assistant_app, 'email_agent'):
-                assistant_app.email_agent = EmailInsightAgent(
-                    assistant_app.anthropic_client, 
-                    assistant_app.gmail_service
-                )
-            
-            analysis = assistant_app.email_agent.analyze_emails(emails)
-            priority_emails = analysis.get('priority_emails', [])
+            return Response(_cached_mock_emails_json(), mimetype='application/json')
         
-        return jsonify({'success': True, 'emails': priority_emails})
+        return jsonify(_priority_emails_payload())
         
     except Exception as e:
         logger.error(f"Priority emails endpoint error: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+# Worker pool for assembling the combined /api/bootstrap payload
+_bootstrap_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='bootstrap')
+
+@app.route('/api/bootstrap', methods=['GET'])
+def get_bootstrap():
+    """Get everything the page needs on first load in one response
+
+    Each section is built concurrently and has the same shape as the
+    response of its standalone endpoint.
+    """
+    sections = {
+        'status': _status_payload,
+        'dashboard': assistant_app.get_dashboard_data,
+        'priority_emails': _priority_emails_payload,
+        'smart_suggestions': _smart_suggestions_payload
+    }
+    futures = {name: _bootstrap_executor.submit(builder) for name, builder in sections.items()}
+    
+    payload = {}
+    for name, future in futures.items():
+        try:
+            payload[name] = future.result()
+        except Exception as e:
+            logger.error(f"Bootstrap {name} error: {e}")
+            payload[name] = {'success': False, 'error': str(e)}
+    
+    return jsonify(payload)
+
 @app.route('/api/disconnect', methods=['POST'])
 def disconnect_google():
     """Disconnect from Google services"""
     try:
-        # Clear authentication state
-        assistant_app.authenticated = False
-        assistant_app.calendar_service = None
-        assistant_app.gmail_service = None
-        assistant_app.tasks_service = None
-        assistant_app.calendar_agent = None
-        
-        # Remove token file
-        import os
-        token_file = 'credentials/token.pickle'
-        if os.path.exists(token_file):
-            os.remove(token_file)
-            logger.info("Authentication tokens cleared")
+        # Remove the saved token first, so a concurrent sync on this worker can't reload
+        # it after the services are cleared; other workers disconnect when they see it gone
+        with assistant_app._auth_lock:
+            if assistant_app.token_store.delete():
+                logger.info("Authentication tokens cleared")
+            
+            # Clear authentication state
+            assistant_app._clear_google_services()
         
         return jsonify({'success': True, 'message': 'Successfully disconnected from Google services'})
         
@@ -1348,13 +1732,13 @@ def disconnect_google():
 def create_google_task():
     """Create a new Google Task"""
     try:
-        data = request.get_json()
+        data = _request_json()
         if not data:
-            return jsonify({'success': False, 'error': 'No data provided'})
+            return _json_response(_NO_DATA)
         
         title = data.get('title', '').strip()
         if not title:
-            return jsonify({'success': False, 'error': 'Task title is required'})
+            return _json_response(_TASK_TITLE_IS_REQUIRED)
         
         description = data.get('description', '').strip()
         due_date = data.get('due_date')
@@ -1376,6 +1760,7 @@ def create_google_task():
             )
             
             if result and result.get('success'):
+                assistant_app.invalidate_dashboard_cache()
                 return jsonify({
                     'success': True, 
                     'message': f'Task "{title}" created successfully in Google Tasks',
@@ -1,64 +1,252 @@
 # task_manager.py - Enhanced Task Management System
-import json
+import os
+import time
+import atexit
+import hashlib
 import logging
+import threading
+import orjson
+from collections import OrderedDict
+from functools import lru_cache
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 import anthropic
-from models import Task
+import httpx
+from models import Task, PRIORITY_HIGH
 from config import Config
 
+# ciso8601 parses ISO timestamps several times faster; fall back to the stdlib parser,
+# which is itself implemented in C (a regex fast path measured ~10x slower than it)
+try:
+    from ciso8601 import parse_datetime
+except ImportError:
+    parse_datetime = datetime.fromisoformat
+
+# numpy (installed with pandas) sorts large pending lists in C; small ones sort fine in Python
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 logger = logging.getLogger(__name__)
 
+# Pending-task ordering: Task.priority_rank, then due date
+_DT_MAX = datetime.max.replace(tzinfo=None)
+# Pending-task count from which the numpy sort beats building and sorting tuples
+_NUMPY_SORT_MIN = 1000
+
+# Keep-alive pool shared by every agent, so calls reuse warm TLS connections
+_ANTHROPIC_POOL_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60)
+
+@lru_cache(maxsize=1)
+def get_anthropic_client():
+    """Return the process-wide Anthropic client, or None when no API key is configured"""
+    if not Config.ANTHROPIC_API_KEY:
+        return None
+    return anthropic.Anthropic(
+        api_key=Config.ANTHROPIC_API_KEY,
+        http_client=anthropic.DefaultHttpxClient(limits=_ANTHROPIC_POOL_LIMITS)
+    )
+
+def _message_params(instructions: str, prompt: str, max_tokens: int) -> Dict[str, Any]:
+    """Build the messages.create arguments for an AI request"""
+    return {
+        "model": "claude-sonnet-4-20250514",
+        "max_tokens": max_tokens,
+        # The fixed instructions go first as a cacheable system block; Anthropic only
+        # caches prefixes past its minimum length, so short ones are simply sent as-is
+        "system": [{"type": "text", "text": instructions, "cache_control": {"type": "ephemeral"}}],
+        "messages": [{"role": "user", "content": prompt}]
+    }
+
+def _response_text(response) -> str:
+    """Return the text of the first content block of a Claude response"""
+    return response.content[0].text if hasattr(response.content[0], 'text') else str(response.content[0])
+
+def _auth_failure(on_auth_error, error) -> Dict[str, Any]:
+    """Report a rejected API key to the owner's callback and build the error result"""
+    if on_auth_error:
+        on_auth_error(error)
+    else:
+        logger.error(f"Anthropic API key rejected: {error}")
+    return {"success": False, "error": "AI client not available"}
+
+# Reply text of recent AI prompts keyed by a digest of the request, least recently used first
+_llm_cache = OrderedDict()
+_llm_cache_lock = threading.Lock()
+
+def _llm_cache_key(params: Dict[str, Any]) -> bytes:
+    """Digest of the model, token limit, instructions and prompt of an AI request"""
+    request = f"{params['model']}\0{params['max_tokens']}\0{params['system'][0]['text']}\0{params['messages'][0]['content']}"
+    return hashlib.blake2b(request.encode(), digest_size=16).digest()
+
+def _cached_reply(key: bytes) -> Optional[str]:
+    """Return the stored reply for a request digest, if any"""
+    with _llm_cache_lock:
+        text = _llm_cache.get(key)
+        if text is not None:
+            _llm_cache.move_to_end(key)
+        return text
+
+def _remember_reply(key: bytes, text: str):
+    """Store a reply, evicting the least recently used ones past the size cap"""
+    with _llm_cache_lock:
+        _llm_cache[key] = text
+        _llm_cache.move_to_end(key)
+        while len(_llm_cache) > Config.LLM_RESPONSE_CACHE_SIZE:
+            _llm_cache.popitem(last=False)
+
+def _complete(client, instructions: str, prompt: str, max_tokens: int, parse=None):
+    """Ask the AI, reusing the reply to an identical earlier prompt
+
+    When parse is given the parsed reply is returned, and replies that fail
+    to parse are not cached so a retry asks again.
+    """
+    params = _message_params(instructions, prompt, max_tokens)
+    key = _llm_cache_key(params)
+    text = _cached_reply(key)
+    if text is None:
+        text = _response_text(client.messages.create(**params))
+        result = parse(text) if parse else text
+        _remember_reply(key, text)
+        return result
+    return parse(text) if parse else text
+
 class TaskManager:
     """Enhanced task management with AI-powered features"""
     
-    def __init__(self, anthropic_client=None):
+    # Minimum seconds between two writes of the tasks file
+    FLUSH_INTERVAL = 1.0
+    
+    def __init__(self, anthropic_client=None, on_auth_error=None):
         self.client = anthropic_client
+        # Called with the AuthenticationError when the API rejects the key
+        self.on_auth_error = on_auth_error
         self.tasks_file = Path('data/tasks.json')
         self.tasks_file.parent.mkdir(exist_ok=True)
         self.tasks = self._load_tasks()
+        self._build_index()
+        
+        # Sorted task views, reused until the next change bumps the version
+        self._version = 0
+        self._views = {}
+        # Guards the task list, its index and the views: request threads read them
+        # while others add and complete tasks (re-entrant, as changes also save)
+        self._lock = threading.RLock()
+        
+        # Changes are written behind a short debounce; pending ones are flushed at exit
+        self._dirty = False
+        self._last_flush = 0.0
+        self._flush_timer = None
+        self._flush_lock = threading.Lock()
+        atexit.register(self._flush_tasks)
     
     def _load_tasks(self) -> List[Task]:
         """Load tasks from storage"""
         try:
             if self.tasks_file.exists():
-                with open(self.tasks_file, 'r') as f:
-                    tasks_data = json.load(f)
+                with open(self.tasks_file, 'rb') as f:
+                    tasks_data = orjson.loads(f.read())
                     return [self._dict_to_task(task_dict) for task_dict in tasks_data]
             return []
         except Exception as e:
             logger.error(f"Error loading tasks: {e}")
             return []
     
+    def _build_index(self):
+        """Partition tasks by state and index pending tasks by lowercased title"""
+        # Pending tasks in creation order (keyed by id for O(1) removal), completed
+        # tasks, and the pending tasks sharing each title
+        self._pending = {}
+        self._completed = []
+        self._pending_by_title = {}
+        self._high_priority_count = 0
+        for task in self.tasks:
+            self._index_task(task)
+    
+    def _index_task(self, task):
+        """Add a task to its state partition, the title index and counters"""
+        if task.completed:
+            self._completed.append(task)
+            return
+        self._pending[id(task)] = task
+        self._pending_by_title.setdefault(task.title.lower(), []).append(task)
+        if task.priority_rank == PRIORITY_HIGH:
+            self._high_priority_count += 1
+    
     def _save_tasks(self):
-        """Save tasks to storage"""
-        try:
-            tasks_data = [task.to_dict() for task in self.tasks]
-            with open(self.tasks_file, 'w') as f:
-                json.dump(tasks_data, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving tasks: {e}")
+        """Mark tasks as changed and save them, writing at most once per FLUSH_INTERVAL"""
+        with self._lock:
+            self._version += 1
+            self._views.clear()
+            Task.dict_version += 1
+        
+        with self._flush_lock:
+            self._dirty = True
+            wait = self.FLUSH_INTERVAL - (time.monotonic() - self._last_flush)
+            if wait > 0:
+                # A burst of changes shares one delayed write
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(wait, self._flush_tasks)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return
+        self._flush_tasks()
+    
+    def _flush_tasks(self):
+        """Write tasks to storage atomically if they changed since the last write"""
+        with self._flush_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            try:
+                tasks_data = [self._task_to_record(task) for task in self.tasks]
+                tmp_file = self.tasks_file.with_name(f"{self.tasks_file.name}.{os.getpid()}.tmp")
+                # One unbuffered write of the whole document, synced before the rename
+                # so a crash can't leave a renamed but empty or truncated file
+                with open(tmp_file, 'wb', buffering=0) as f:
+                    f.write(orjson.dumps(tasks_data))
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.tasks_file)
+                self._dirty = False
+                self._last_flush = time.monotonic()
+            except Exception as e:
+                logger.error(f"Error saving tasks: {e}")
+    
+    def _task_to_record(self, task: Task) -> Dict:
+        """Convert Task object to its on-disk form, with datetimes as epoch seconds"""
+        return {
+            'title': task.title,
+            'priority': task.priority,
+            'due_date_ts': task.due_date.timestamp() if task.due_date else None,
+            'description': task.description,
+            'completed': task.completed,
+            'created_at_ts': task.created_at.timestamp() if task.created_at else None
+        }
+    
+    def _record_datetime(self, task_dict: Dict, field: str) -> Optional[datetime]:
+        """Read a stored datetime, preferring epoch seconds over a legacy ISO string"""
+        ts = task_dict.get(f'{field}_ts')
+        if ts is not None:
+            return datetime.fromtimestamp(ts)
+        value = task_dict.get(field)
+        return parse_datetime(value) if value else None
     
     def _dict_to_task(self, task_dict: Dict) -> Task:
         """Convert dictionary to Task object"""
         return Task(
             title=task_dict['title'],
             priority=task_dict['priority'],
-            due_date=datetime.fromisoformat(task_dict['due_date']) if task_dict.get('due_date') else None,
+            due_date=self._record_datetime(task_dict, 'due_date'),
             description=task_dict['description'],
             completed=task_dict.get('completed', False),
-            created_at=datetime.fromisoformat(task_dict['created_at']) if task_dict.get('created_at') else datetime.now()
+            created_at=self._record_datetime(task_dict, 'created_at') or datetime.now()
         )
     
-    def create_task_from_message(self, message: str) -> Dict[str, Any]:
-        """Create a task using AI to parse the message"""
-        if not self.client:
-            return {"success": False, "error": "AI client not available"}
-        
-        try:
-            prompt = f"""Extract task details from this message:
-"{message}"
+    TASK_INSTRUCTIONS = """Extract task details from the user's message.
 
 Return a JSON object with:
 - title: brief task title
@@ -66,101 +254,204 @@ Return a JSON object with:
 - priority: "high", "medium", or "low"
 - due_date: ISO format date if mentioned, null otherwise
 
-Example: {{"title": "Review proposal", "description": "Review the Q4 budget proposal from finance team", "priority": "medium", "due_date": "2025-06-30T17:00:00"}}
+Example: {"title": "Review proposal", "description": "Review the Q4 budget proposal from finance team", "priority": "medium", "due_date": "2025-06-30T17:00:00"}
 
 Return only the JSON object."""
-
-            response = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=200,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            response_text = response.content[0].text if hasattr(response.content[0], 'text') else str(response.content[0])
-            task_data = json.loads(response_text.strip())
-            
-            # Create the task
-            due_date = None
-            if task_data.get('due_date'):
-                due_date = datetime.fromisoformat(task_data['due_date'])
-            
-            task = Task(
-                title=task_data['title'],
-                priority=task_data.get('priority', 'medium'),
-                due_date=due_date,
-                description=task_data.get('description', task_data['title'])
-            )
-            
+    
+    def _task_prompt(self, message: str) -> str:
+        """Build the prompt that extracts task details from a message"""
+        return f'"{message}"'
+    
+    def _add_task(self, task_data: Dict) -> Dict[str, Any]:
+        """Create and store the task described by the AI's parsed reply"""
+        # Create the task; the prompt asks for an ISO due_date (or null)
+        due_date = None
+        if task_data.get('due_date'):
+            due_date = parse_datetime(task_data['due_date'])
+        
+        task = Task(
+            title=task_data['title'],
+            priority=task_data.get('priority', 'medium'),
+            due_date=due_date,
+            description=task_data.get('description', task_data['title'])
+        )
+        
+        with self._lock:
             self.tasks.append(task)
+            self._index_task(task)
             self._save_tasks()
+        
+        return {
+            "success": True,
+            "task": task.to_dict(),
+            "message": f"Created task: {task.title}"
+        }
+    
+    def create_task_from_message(self, message: str) -> Dict[str, Any]:
+        """Create a task using AI to parse the message"""
+        if not self.client:
+            return {"success": False, "error": "AI client not available"}
+        
+        try:
+            return self._add_task(_complete(self.client, self.TASK_INSTRUCTIONS, self._task_prompt(message), 200, orjson.loads))
             
-            return {
-                "success": True,
-                "task": task.to_dict(),
-                "message": f"Created task: {task.title}"
-            }
-            
+        except anthropic.AuthenticationError as e:
+            return _auth_failure(self.on_auth_error, e)
         except Exception as e:
             logger.error(f"Error creating task from message: {e}")
             return {"success": False, "error": str(e)}
     
+
+    def _cached_view(self, name, build):
+        """Return a task view built at most once per task-list version"""
+        with self._lock:
+            key = (name, self._version)
+            view = self._views.get(key)
+            if view is None:
+                view = self._views[key] = build()
+            return list(view)
+    
     def get_tasks(self, include_completed: bool = False) -> List[Dict]:
         """Get all tasks"""
-        tasks = self.tasks if include_completed else [t for t in self.tasks if not t.completed]
-        return [task.to_dict() for task in sorted(tasks, key=lambda x: x.created_at, reverse=True)]
+        def build():
+            tasks = self.tasks if include_completed else self._pending.values()
+            return [task.to_dict() for task in sorted(tasks, key=lambda x: x.created_at, reverse=True)]
+        return self._cached_view(('tasks', include_completed), build)
     
     def get_pending_tasks(self) -> List[Dict]:
         """Get pending tasks sorted by priority and due date"""
-        pending = [t for t in self.tasks if not t.completed]
-        
-        # Sort by priority (high first) then by due date
-        priority_order = {'high': 0, 'medium': 1, 'low': 2}
-        
-        def sort_key(task):
-            priority_value = priority_order.get(task.priority, 1)
-            due_value = task.due_date if task.due_date else datetime.max.replace(tzinfo=None)
-            return (priority_value, due_value)
+        return self._cached_view('pending', self._build_pending_view)
+    
+    def _build_pending_view(self) -> List[Dict]:
+        """Sort pending tasks by priority (high first) then by due date"""
+        if np is not None and len(self._pending) >= _NUMPY_SORT_MIN:
+            pending, dues = self._pending_due_ts()
+            prios = np.fromiter((t.priority_rank for t in pending), dtype=np.int8, count=len(pending))
+            # lexsort is stable and sorts by the last key first, matching the tuple order below
+            return [pending[i].to_dict() for i in np.lexsort((dues, prios))]
         
-        sorted_tasks = sorted(pending, key=sort_key)
-        return [task.to_dict() for task in sorted_tasks]
+        # Decorate once with (priority, due, position) so sorting compares plain tuples;
+        # the position keeps equal keys in creation order and never compares tasks
+        decorated = sorted(
+            (task.priority_rank, task.due_date or _DT_MAX, position, task)
+            for position, task in enumerate(self._pending.values())
+        )
+        return [entry[3].to_dict() for entry in decorated]
+    
+    def _pending_due_ts(self):
+        """Pending tasks with a parallel array of due timestamps (inf when undated), built once per version"""
+        key = ('due_ts', self._version)
+        arrays = self._views.get(key)
+        if arrays is None:
+            pending = list(self._pending.values())
+            dues = np.fromiter((t.due_date.timestamp() if t.due_date else np.inf for t in pending), dtype=np.float64, count=len(pending))
+            arrays = self._views[key] = (pending, dues)
+        return arrays
     
     def get_overdue_tasks(self) -> List[Dict]:
         """Get overdue tasks"""
-        now = datetime.now()
-        overdue = [t for t in self.tasks if not t.completed and t.due_date and t.due_date < now]
-        return [task.to_dict() for task in overdue]
+        with self._lock:
+            if np is not None:
+                pending, dues = self._pending_due_ts()
+                return [pending[i].to_dict() for i in np.flatnonzero(dues < time.time())]
+            
+            now = datetime.now()
+            overdue = [t for t in self._pending.values() if t.due_date and t.due_date < now]
+            return [task.to_dict() for task in overdue]
     
     def complete_task(self, task_title: str) -> Dict[str, Any]:
         """Mark a task as completed"""
-        for task in self.tasks:
-            if task.title.lower() == task_title.lower() and not task.completed:
-                task.completed = True
-                self._save_tasks()
-                return {"success": True, "message": f"Completed task: {task.title}"}
-        
-        return {"success": False, "error": "Task not found"}
+        with self._lock:
+            # The oldest pending task with this title, as a front-to-back scan would find
+            same_title = self._pending_by_title.get(task_title.lower())
+            if not same_title:
+                return {"success": False, "error": "Task not found"}
+            
+            task = same_title.pop(0)
+            if not same_title:
+                del self._pending_by_title[task_title.lower()]
+            del self._pending[id(task)]
+            self._completed.append(task)
+            if task.priority_rank == PRIORITY_HIGH:
+                self._high_priority_count -= 1
+            
+            task.completed = True
+            self._save_tasks()
+        return {"success": True, "message": f"Completed task: {task.title}"}
     
     def get_task_summary(self) -> Dict[str, Any]:
         """Get a summary of all tasks"""
-        pending = [t for t in self.tasks if not t.completed]
-        overdue = self.get_overdue_tasks()
-        
-        return {
-            "total": len(self.tasks),
-            "pending": len(pending),
-            "completed": len([t for t in self.tasks if t.completed]),
-            "overdue": len(overdue),
-            "high_priority": len([t for t in pending if t.priority == 'high']),
-            "due_today": len([t for t in pending if t.due_date and t.due_date.date() == datetime.now().date()])
-        }
+        # Overdue and due-today depend on the clock, so only they need a pass over pending tasks
+        now = datetime.now()
+        with self._lock:
+            if np is not None:
+                _, dues = self._pending_due_ts()
+                day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+                overdue = int(np.count_nonzero(dues < now.timestamp()))
+                due_today = int(np.count_nonzero((dues >= day_start.timestamp()) & (dues < (day_start + timedelta(days=1)).timestamp())))
+            else:
+                today = now.date()
+                overdue = 0
+                due_today = 0
+                for task in self._pending.values():
+                    if task.due_date:
+                        if task.due_date < now:
+                            overdue += 1
+                        if task.due_date.date() == today:
+                            due_today += 1
+            
+            return {
+                "total": len(self.tasks),
+                "pending": len(self._pending),
+                "completed": len(self._completed),
+                "overdue": overdue,
+                "high_priority": self._high_priority_count,
+                "due_today": due_today
+            }
 
 class SmartSchedulingAgent:
     """AI-powered scheduling agent for calendar management"""
     
-    def __init__(self, anthropic_client, calendar_service):
+    def __init__(self, anthropic_client, calendar_service, on_auth_error=None):
         self.client = anthropic_client
+        # Called with the AuthenticationError when the API rejects the key
+        self.on_auth_error = on_auth_error
         self.calendar = calendar_service
     
+    MEETING_TIMES_INSTRUCTIONS = """Rank the top 3 most suitable of the available time slots for the user's meeting request, considering:
+- Professional hours (9 AM - 5 PM preferred)
+- Avoiding Monday mornings and Friday afternoons
+- Meeting type appropriateness
+
+Return format:
+1. [Date and time] - [Reason]
+2. [Date and time] - [Reason]  
+3. [Date and time] - [Reason]"""
+    
+    MEETING_REQUEST_INSTRUCTIONS = """Parse the user's meeting request and extract details.
+
+Return JSON with:
+- title: meeting title
+- attendees: list of email addresses if mentioned
+- duration: estimated duration in minutes
+- description: agenda or purpose
+- urgency: "high", "medium", "low"
+- preferred_times: any time preferences mentioned
+
+Example: {"title": "Budget Review", "attendees": ["john@company.com"], "duration": 60, "description": "Review Q4 budget proposals", "urgency": "medium", "preferred_times": "next week afternoons"}"""
+    
+    def _meeting_times_prompt(self, request: str, free_slots: List[Dict]) -> str:
+        """Build the prompt that ranks free slots for a meeting request"""
+        slots_text = "\n".join([
+            f"- {slot['start'].strftime('%A, %B %d at %I:%M %p')} for {slot['duration']} minutes"
+            for slot in free_slots[:8]
+        ])
+        
+        return f"""Meeting request: "{request}"
+            
+Available time slots:
+{slots_text}"""
+    
     def suggest_meeting_times(self, request: str, duration_minutes: int = 60) -> Dict[str, Any]:
         """Suggest optimal meeting times based on calendar and preferences"""
         try:
@@ -174,33 +465,7 @@ class SmartSchedulingAgent:
                 }
             
             # Use AI to rank suggestions based on context
-            slots_text = "\n".join([
-                f"- {slot['start'].strftime('%A, %B %d at %I:%M %p')} for {slot['duration']} minutes"
-                for slot in free_slots[:8]
-            ])
-            
-            prompt = f"""Based on this meeting request: "{request}"
-            
-Available time slots:
-{slots_text}
-
-Rank the top 3 most suitable times considering:
-- Professional hours (9 AM - 5 PM preferred)
-- Avoiding Monday mornings and Friday afternoons
-- Meeting type appropriateness
-
-Return format:
-1. [Date and time] - [Reason]
-2. [Date and time] - [Reason]  
-3. [Date and time] - [Reason]"""
-
-            response = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=300,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            suggestions = response.content[0].text if hasattr(response.content[0], 'text') else str(response.content[0])
+            suggestions = _complete(self.client, self.MEETING_TIMES_INSTRUCTIONS, self._meeting_times_prompt(request, free_slots), 300)
             
             return {
                 "success": True,
@@ -208,99 +473,53 @@ Return format:
                 "free_slots": free_slots[:5]  # Return top 5 technical slots
             }
             
+        except anthropic.AuthenticationError as e:
+            return _auth_failure(self.on_auth_error, e)
         except Exception as e:
             logger.error(f"Error suggesting meeting times: {e}")
             return {"success": False, "error": str(e)}
     
+
+    def _meeting_request_prompt(self, message: str) -> str:
+        """Build the prompt that extracts meeting details from a message"""
+        return f'"{message}"'
+    
     def parse_meeting_request(self, message: str) -> Dict[str, Any]:
         """Parse a natural language meeting request"""
         try:
-            prompt = f"""Parse this meeting request and extract details:
-"{message}"
-
-Return JSON with:
-- title: meeting title
-- attendees: list of email addresses if mentioned
-- duration: estimated duration in minutes
-- description: agenda or purpose
-- urgency: "high", "medium", "low"
-- preferred_times: any time preferences mentioned
-
-Example: {{"title": "Budget Review", "attendees": ["john@company.com"], "duration": 60, "description": "Review Q4 budget proposals", "urgency": "medium", "preferred_times": "next week afternoons"}}"""
-
-            response = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=250,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            response_text = response.content[0].text if hasattr(response.content[0], 'text') else str(response.content[0])
-            meeting_data = json.loads(response_text.strip())
+            meeting_data = _complete(self.client, self.MEETING_REQUEST_INSTRUCTIONS, self._meeting_request_prompt(message), 250, orjson.loads)
             
             return {"success": True, "meeting_data": meeting_data}
             
+        except anthropic.AuthenticationError as e:
+            return _auth_failure(self.on_auth_error, e)
         except Exception as e:
             logger.error(f"Error parsing meeting request: {e}")
             return {"success": False, "error": str(e)}
+    
 
 class EmailInsightAgent:
     """AI agent for email analysis and insights"""
     
-    def __init__(self, anthropic_client, gmail_service):
+    def __init__(self, anthropic_client, gmail_service, on_auth_error=None):
         self.client = anthropic_client
+        # Called with the AuthenticationError when the API rejects the key
+        self.on_auth_error = on_auth_error
         self.gmail = gmail_service
-    
-    def analyze_emails(self, emails: List) -> Dict[str, Any]:
-        """Analyze recent emails for insights"""
-        if not self.client or not emails:
-            return {"success": False, "insights": []}
         
-        try:
-            # Prepare email summary for analysis
-            email_summaries = []
-            for email in emails[:10]:  # Analyze last 10 emails
-                summary = f"From: {email.sender}\nSubject: {email.subject}\nPriority: {email.priority}"
-                email_summaries.append(summary)
-            
-            emails_text = "\n---\n".join(email_summaries)
-            
-            prompt = f"""Analyze these recent emails and provide actionable insights:
-
-{emails_text}
-
-Provide insights about:
+        # Gmail ids covered by the last successful analysis, and that analysis
+        self._analyzed_ids = frozenset()
+        self._last_analysis = None
+    
+    ANALYSIS_INSTRUCTIONS = """Analyze the user's recent emails and provide actionable insights about:
 1. Urgent items requiring immediate attention
 2. Recurring themes or topics
 3. People who need responses
 4. Time-sensitive opportunities
 
 Format as bullet points, be concise and actionable."""
-
-            response = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=300,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            insights = response.content[0].text if hasattr(response.content[0], 'text') else str(response.content[0])
-            
-            return {
-                "success": True,
-                "insights": insights,
-                "emails_analyzed": len(emails)
-            }
-            
-        except Exception as e:
-            logger.error(f"Error analyzing emails: {e}")
-            return {"success": False, "error": str(e)}
     
-    def suggest_email_responses(self, email_content: str, context: str = "") -> Dict[str, Any]:
-        """Suggest email response templates"""
-        try:
-            prompt = f"""Generate 3 professional email response options for:
-
-Email content: "{email_content}"
-Context: {context}
+    RESPONSES_INSTRUCTIONS = """Generate 3 professional email response options for the user's email.
 
 Provide:
 1. Quick acknowledgment (1-2 sentences)
@@ -308,17 +527,71 @@ Provide:
 3. Meeting request (if applicable)
 
 Keep responses professional and concise."""
-
-            response = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=400,
-                messages=[{"role": "user", "content": prompt}]
-            )
+    
+    def _analysis_prompt(self, emails: List) -> str:
+        """Build the prompt that asks for insights over recent emails"""
+        # Prepare email summary for analysis in one pass, without an intermediate list
+        return "\n---\n".join(
+            f"From: {email.sender}\nSubject: {email.subject}\nPriority: {email.priority}"
+            for email in emails[:10]  # Analyze last 10 emails
+        )
+    
+    def _previous_analysis(self, emails: List) -> Optional[Dict[str, Any]]:
+        """Return the last analysis if it already covered every email that would be analyzed"""
+        if self._last_analysis is None:
+            return None
+        ids = [email.gmail_id for email in emails[:10]]
+        if None in ids or not self._analyzed_ids.issuperset(ids):
+            return None
+        return {**self._last_analysis, "emails_analyzed": len(emails)}
+    
+    def _record_analysis(self, emails: List, insights: str) -> Dict[str, Any]:
+        """Build an analysis result and remember which emails it covered"""
+        analysis = {
+            "success": True,
+            "insights": insights,
+            "emails_analyzed": len(emails)
+        }
+        self._analyzed_ids = frozenset(email.gmail_id for email in emails[:10] if email.gmail_id)
+        self._last_analysis = analysis
+        return analysis
+    
+    def analyze_emails(self, emails: List) -> Dict[str, Any]:
+        """Analyze recent emails for insights"""
+        if not self.client or not emails:
+            return {"success": False, "insights": []}
+        
+        # Nothing new since the last analysis (e.g. a periodic refresh): skip the AI call
+        previous = self._previous_analysis(emails)
+        if previous is not None:
+            return previous
+        
+        try:
+            insights = _complete(self.client, self.ANALYSIS_INSTRUCTIONS, self._analysis_prompt(emails), 300)
+            return self._record_analysis(emails, insights)
             
-            suggestions = response.content[0].text if hasattr(response.content[0], 'text') else str(response.content[0])
+        except anthropic.AuthenticationError as e:
+            return _auth_failure(self.on_auth_error, e)
+        except Exception as e:
+            logger.error(f"Error analyzing emails: {e}")
+            return {"success": False, "error": str(e)}
+    
+
+    def _responses_prompt(self, email_content: str, context: str) -> str:
+        """Build the prompt that drafts response options for an email"""
+        return f"""Email content: "{email_content}"
+Context: {context}"""
+    
+    def suggest_email_responses(self, email_content: str, context: str = "") -> Dict[str, Any]:
+        """Suggest email response templates"""
+        try:
+            suggestions = _complete(self.client, self.RESPONSES_INSTRUCTIONS, self._responses_prompt(email_content, context), 400)
             
             return {"success": True, "suggestions": suggestions}
             
+        except anthropic.AuthenticationError as e:
+            return _auth_failure(self.on_auth_error, e)
         except Exception as e:
             logger.error(f"Error suggesting email responses: {e}")
-            return {"success": False, "error": str(e)}
\ No newline at end of file
+            return {"success": False, "error": str(e)}
+
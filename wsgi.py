@@ -0,0 +1,5 @@
+# wsgi.py - WSGI entrypoint for production servers
+from app import app
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000)